@@ -1,9 +1,33 @@
-import pygame
 import math
 
+import numpy as np
+
+from sensors import SensorArray
+
 
 class Car:
-    def __init__(self, start_position, start_angle):
+    __slots__ = (
+        "position",
+        "angle",
+        "max_speed",
+        "min_speed",
+        "speed",
+        "acceleration",
+        "turn_rate",
+        "width",
+        "height",
+        "total_distance",
+        "last_position",
+        "is_alive",
+        "sensors",
+        "current_checkpoint",
+        "checkpoints_passed",
+    )
+
+    # Sprites shared by every car, keyed by (width, height, is_alive)
+    _images = {}
+
+    def __init__(self, start_position, start_angle, sensors=None):
         self.position = list(start_position)
         self.angle = start_angle
         self.max_speed = 20
@@ -16,9 +40,9 @@ class Car:
         self.total_distance = 0
         self.last_position = list(start_position)
         self.is_alive = True
-        self.ray_angles = [-75, -35, 0, 35, 75]
-        self.car_image = pygame.image.load("car.png").convert_alpha()
-        self.car_image = pygame.transform.scale(self.car_image, (self.width, self.height))
+        self.sensors = sensors or SensorArray()
+        self.current_checkpoint = 0
+        self.checkpoints_passed = 0
 
     def turn_left(self):
         """Turn left"""
@@ -71,59 +95,49 @@ class Car:
         self.current_checkpoint = 0
         self.checkpoints_passed = 0
         
-    def raycast(self, track, angle_offset=0, max_distance=200):
-        """Cast a ray from car position in given direction and return distance to wall"""
-        if not self.is_alive:
-            return 0
-        
-        ray_angle = math.radians(self.angle + angle_offset)
-        start_x, start_y = self.position
-        step_size = 2
-        distance = 0
-        
-        while distance < max_distance:
-            ray_x = start_x + distance * math.cos(ray_angle)
-            ray_y = start_y + distance * math.sin(ray_angle)
-            
-            if not track.is_on_track((ray_x, ray_y)):
-                return distance
-            
-            distance += step_size
-        
-        return max_distance
-    
+    def next_checkpoint(self, track):
+        """Position of the checkpoint the car is heading for"""
+        if not track.checkpoints:
+            return self.position
+        return track.checkpoints[self.current_checkpoint % len(track.checkpoints)]
+
     def get_state(self, track):
         """Get current state for RL agent - returns normalized sensor readings and car info"""
-        if not self.is_alive: #TODO DO I NEED THIS??
-            return [0, 0, 0, 0, 0]
-        
-        ray_distances = [self.raycast(track, angle) for angle in self.ray_angles]
-        
-        max_sensor_range = 100
-        normalized_rays = [min(d / max_sensor_range, 1.0) for d in ray_distances]
-        rad = math.radians(self.angle)
-        normalized_angle_vector = [math.cos(rad), math.sin(rad)]
-        normalized_speed = (self.speed - self.min_speed) / (self.max_speed - self.min_speed) * 2 - 1
+        if not self.is_alive:
+            return np.zeros(self.sensors.num_inputs, dtype=np.float32)
+
+        return self.sensors.read(
+            track,
+            self.position,
+            [self.angle],
+            [self.speed],
+            self.min_speed,
+            self.max_speed,
+            [self.next_checkpoint(track)],
+        )[0]
 
-        return normalized_rays + [normalized_speed] + normalized_angle_vector
-        
     def render_rays(self, screen, track, color=(255, 255, 0)):
         """Debug function to visualize rays (optional)"""
+        import pygame
+
         if not self.is_alive:
             return
-    
-        
-        for angle_offset in self.ray_angles:
-            distance = self.raycast(track, angle_offset)
+
+        distances = self.sensors.ray_distances(
+            track, np.array([self.position], dtype=np.float64), np.array([self.angle])
+        )[0]
+        for angle_offset, distance in zip(self.sensors.angles, distances):
             ray_angle = math.radians(self.angle + angle_offset)
-            
+
             end_x = self.position[0] + distance * math.cos(ray_angle)
             end_y = self.position[1] + distance * math.sin(ray_angle)
-            
+
             pygame.draw.line(screen, color, self.position, (end_x, end_y), 1)
 
     def get_rect(self):
         """Get pygame rect for collision detection"""
+        import pygame
+
         return pygame.Rect(
             self.position[0] - self.width // 2,
             self.position[1] - self.height // 2,
@@ -131,17 +145,51 @@ class Car:
             self.height,
         )
     
-    def render(self, screen):
-        """Render the car on screen"""
-        # Use the loaded image instead of creating a surface
-        surface = self.car_image.copy()
-        
-        # Apply red tint if car is dead
-        if not self.is_alive:
-            red_tint = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
-            red_tint.fill((255, 0, 0, 128))  # Red with 50% alpha
-            surface.blit(red_tint, (0, 0))
-        
-        rotated_surface = pygame.transform.rotate(surface, -self.angle)
-        rect = rotated_surface.get_rect(center=(self.position[0], self.position[1]))
-        screen.blit(rotated_surface, rect.topleft)
+    @classmethod
+    def _get_image(cls, width, height, is_alive):
+        """Return the shared sprite, loaded on first use so headless runs need no display"""
+        import pygame
+
+        key = (width, height, is_alive)
+        if key not in cls._images:
+            image = pygame.image.load("car.png").convert_alpha()
+            image = pygame.transform.scale(image, (width, height))
+
+            # Apply red tint if car is dead
+            if not is_alive:
+                red_tint = pygame.Surface((width, height), pygame.SRCALPHA)
+                red_tint.fill((255, 0, 0, 128))  # Red with 50% alpha
+                image.blit(red_tint, (0, 0))
+            cls._images[key] = image
+        return cls._images[key]
+
+    def snapshot(self):
+        """Everything render needs, as a tuple that is safe to hand to another thread"""
+        return (
+            self.position[0],
+            self.position[1],
+            self.angle,
+            self.is_alive,
+            self.width,
+            self.height,
+        )
+
+    @classmethod
+    def render_snapshot(cls, screen, snapshot, offset=(0, 0)):
+        """Render a car from a snapshot and return the rect it covers"""
+        import pygame
+
+        x, y, angle, is_alive, width, height = snapshot
+        x -= offset[0]
+        y -= offset[1]
+        if not screen.get_rect().inflate(width, width).collidepoint(x, y):
+            return pygame.Rect(x, y, 0, 0)
+
+        surface = cls._get_image(width, height, is_alive)
+        rotated_surface = pygame.transform.rotate(surface, -angle)
+        rect = rotated_surface.get_rect(center=(x, y))
+        return screen.blit(rotated_surface, rect.topleft)
+
+    def render(self, screen, offset=(0, 0)):
+        """Render the car on screen and return the rect it covers"""
+        return self.render_snapshot(screen, self.snapshot(), offset)
@@ -0,0 +1,461 @@
+"""
+Command-line batch trainer.
+
+    python cli.py train --map track.npz --generations 100 --workers 8 --seed 1
+    python cli.py evaluate --map track.npz --genome winner.pkl
+    python cli.py replay --map track.npz --genome winner.pkl
+    python cli.py sweep --map track.npz --param pop_size=20,50 --param max_steps=600,1200
+    python cli.py generate --count 10000 --output tracks.npz
+    python cli.py train --map tracks.npz --track-index 42
+    python cli.py generate-tiled --rows 400 --cols 1600 --output endurance
+
+Maps are the .npz files written by track.save_map (the menu saves one as
+track.npz when a simulation is started), one entry of a generated track
+store selected with --track-index, or a tiled map directory for maps larger
+than the screen. Heavy modules are imported inside
+the command functions, and pygame only when something is rendered.
+"""
+
+import argparse
+
+MAX_WINDOW = (1200, 800)
+
+
+def _int_at_least(minimum):
+    """argparse type for integers no smaller than minimum."""
+
+    def parse(text):
+        value = int(text)
+        if value < minimum:
+            raise argparse.ArgumentTypeError(f"must be at least {minimum}")
+        return value
+
+    return parse
+
+
+def _build_sensors(args):
+    if args.rays is None and args.fov is None and not args.checkpoint_inputs:
+        return None
+
+    from sensors import SensorArray
+
+    return SensorArray(
+        num_rays=args.rays,
+        fov=150 if args.fov is None else args.fov,
+        checkpoint_inputs=args.checkpoint_inputs,
+    )
+
+
+def _load_config(args, sensors):
+    from race_environment import RaceEnvironment
+    from simulation import load_config
+
+    return load_config(args.config, RaceEnvironment.num_inputs(sensors))
+
+
+def _create_environment(track, sensors, max_steps):
+    from race_environment import RaceEnvironment
+    from simulation import make_environment
+
+    return make_environment(RaceEnvironment, track, sensors, max_steps)
+
+
+def _load_genome(args):
+    """
+    Load a genome saved by train and the sensor array it was trained with.
+    Sensor options given on the command line replace the saved array, but
+    must produce the same number of network inputs.
+    """
+    import pickle
+
+    from race_environment import RaceEnvironment
+
+    with open(args.genome, "rb") as file:
+        saved = pickle.load(file)
+    genome, sensors = saved["genome"], saved["sensors"]
+
+    requested = _build_sensors(args)
+    if requested is not None:
+        trained_inputs = RaceEnvironment.num_inputs(sensors)
+        if RaceEnvironment.num_inputs(requested) != trained_inputs:
+            raise SystemExit(
+                f"{args.genome} was trained with {trained_inputs} network inputs; "
+                "the --rays, --fov and --checkpoint-inputs options give "
+                f"{RaceEnvironment.num_inputs(requested)}"
+            )
+        sensors = requested
+    return genome, sensors
+
+
+def _load_track(args):
+    import os
+
+    if os.path.isdir(args.map):
+        from tiled_track import TiledTrack
+
+        return TiledTrack.open(args.map)
+
+    if args.track_index is not None:
+        from track_generator import TrackStore
+
+        return TrackStore.load(args.map).track(args.track_index)
+
+    from track import Track
+
+    return Track.from_map_file(args.map)
+
+
+def _open_window(track, caption):
+    import pygame
+
+    pygame.init()
+    screen = pygame.display.set_mode(
+        (min(track.width, MAX_WINDOW[0]), min(track.height, MAX_WINDOW[1]))
+    )
+    pygame.display.set_caption(caption)
+    return screen
+
+
+def _build_metrics(args):
+    from metrics import MetricsCollector, JsonlExporter, PrometheusExporter
+
+    exporters = []
+    if args.metrics_jsonl:
+        exporters.append(JsonlExporter(args.metrics_jsonl))
+    if args.metrics_port:
+        exporters.append(PrometheusExporter(port=args.metrics_port))
+    return MetricsCollector(exporters) if exporters else None
+
+
+def _build_novelty(args):
+    if not args.novelty:
+        return None
+    from novelty import NoveltyArchive
+
+    return NoveltyArchive(k=args.novelty_k, samples=args.novelty_samples)
+
+
+def _build_traffic(args):
+    if not args.traffic:
+        return None
+    from traffic import Traffic
+
+    return Traffic()
+
+
+def train(args):
+    """Evolve a population on a saved map and pickle the best genome and its sensors."""
+    import pickle
+    import random
+
+    from race_environment import RaceEnvironment
+    from simulation import NEATSimulation
+    from track import Track
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    track = _load_track(args)
+    sensors = _build_sensors(args)
+    screen = _open_window(track, "NEAT Racing") if args.render else None
+
+    try:
+        simulation = NEATSimulation(
+            start=track.start_position,
+            checkpoints=track.checkpoints,
+            screen=screen,
+            environment_class=RaceEnvironment,
+            world_class=Track,
+            max_steps=args.max_steps,
+            config_path=args.config,
+            metrics=_build_metrics(args),
+            world=track,
+            workers=args.workers,
+            halving_min_steps=args.halving_min_steps,
+            halving_eta=args.halving_eta,
+            sensors=sensors,
+            novelty=_build_novelty(args),
+            traffic=_build_traffic(args),
+        )
+    except ValueError as error:
+        raise SystemExit(f"train: {error}")
+    winner = simulation.run(generations=args.generations)
+
+    if winner is None:
+        return 1
+    with open(args.output, "wb") as file:
+        pickle.dump({"genome": winner, "sensors": sensors}, file)
+    print(f"Best fitness {winner.fitness:.2f}, genome saved to {args.output}")
+    return 0
+
+
+def evaluate(args):
+    """Run a saved genome headless and print its fitness."""
+    from race_environment import RaceEnvironment
+    from simulation import evaluate_genome
+
+    track = _load_track(args)
+    genome, sensors = _load_genome(args)
+    fitness, steps, checkpoints_passed = evaluate_genome(
+        genome,
+        _load_config(args, sensors),
+        track,
+        RaceEnvironment,
+        args.max_steps,
+        env=_create_environment(track, sensors, args.max_steps),
+    )
+    print(
+        f"Fitness {fitness:.2f} after {steps} steps, "
+        f"{checkpoints_passed} checkpoints passed"
+    )
+    return 0
+
+
+def replay(args):
+    """Render a saved genome driving the map."""
+    import neat
+    import numpy as np
+
+    track = _load_track(args)
+    screen = _open_window(track, "NEAT Replay")
+
+    import pygame
+
+    clock = pygame.time.Clock()
+    genome, sensors = _load_genome(args)
+    net = neat.nn.FeedForwardNetwork.create(genome, _load_config(args, sensors))
+    env = _create_environment(track, sensors, args.max_steps)
+    state = env.reset()
+
+    done = False
+    steps = 0
+    while not done and steps < args.max_steps:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                done = True
+
+        state, _, done, _ = env.step(np.argmax(net.activate(state)))
+        steps += 1
+
+        offset = track.camera_offset(env.car.position, screen.get_size())
+        screen.fill((0, 0, 0))
+        track.draw(screen, offset)
+        env.render_entity(screen, offset)
+        pygame.display.flip()
+        clock.tick(args.fps)
+
+    pygame.quit()
+    return 0
+
+
+def sweep(args):
+    """Search NEAT/GameConfig parameters with successive halving."""
+    import random
+
+    from sweep import (
+        SweepRunner,
+        grid_trials,
+        parse_param,
+        random_trials,
+        write_results,
+    )
+
+    params = dict(parse_param(spec) for spec in args.param)
+    if args.samples:
+        trials = random_trials(params, args.samples, random.Random(args.seed))
+    else:
+        trials = grid_trials(params)
+
+    runner = SweepRunner(
+        _load_track(args),
+        args.config,
+        trials,
+        workers=args.workers,
+        min_generations=args.min_generations,
+        max_generations=args.generations,
+        eta=args.eta,
+        max_steps=args.max_steps,
+        seed=args.seed,
+        sensors=_build_sensors(args),
+    )
+    results = runner.run()
+    write_results(results, args.output)
+
+    for result in results:
+        print(
+            f"Trial {result['trial']}: fitness {result['best_fitness']:.2f} "
+            f"in {result['wall_seconds']:.1f}s ({result['status']}) {result['params']}"
+        )
+    print(f"Results written to {args.output}")
+    return 0
+
+
+def generate(args):
+    """Generate a store of random closed-loop tracks."""
+    from track_generator import TrackGenerator, TrackStore
+
+    generator = TrackGenerator(num_checkpoints=args.checkpoints, seed=args.seed)
+    try:
+        store = TrackStore(*generator.generate(args.count))
+    except ValueError as error:
+        raise SystemExit(f"generate: {error}")
+    store.save(args.output)
+    print(f"{len(store)} tracks written to {args.output}")
+    return 0
+
+
+def generate_tiled(args):
+    """Generate one large closed-loop track as a tiled map directory."""
+    from tiled_track import save_tiled_map
+    from track_generator import GRID_SIZE, TrackGenerator
+
+    generator = TrackGenerator(
+        rows=args.rows,
+        cols=args.cols,
+        lane_width=args.lane_width,
+        num_checkpoints=args.checkpoints,
+        seed=args.seed,
+    )
+    try:
+        grids, starts, checkpoints = generator.generate(1, batch_size=4)
+    except ValueError as error:
+        raise SystemExit(f"generate-tiled: {error}")
+
+    def centre(col, row):
+        return (
+            int(col) * GRID_SIZE + GRID_SIZE // 2,
+            int(row) * GRID_SIZE + GRID_SIZE // 2,
+        )
+
+    save_tiled_map(
+        args.output,
+        grids[0],
+        centre(*starts[0]),
+        [centre(col, row) for col, row in checkpoints[0]],
+        tile_size=args.tile_size,
+    )
+    print(
+        f"{args.cols * GRID_SIZE}x{args.rows * GRID_SIZE} map written to {args.output}"
+    )
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Train and inspect NEAT racers.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(subparser):
+        subparser.add_argument("--map", required=True, help="map saved by save_map")
+        subparser.add_argument("--config", default="config-feedforward.txt")
+        subparser.add_argument("--max-steps", type=int, default=1200)
+        subparser.add_argument(
+            "--track-index", type=int, default=None, help="entry of a track store"
+        )
+        subparser.add_argument(
+            "--rays", type=int, default=None, help="sensor rays (default 5 fixed)"
+        )
+        subparser.add_argument(
+            "--fov", type=float, default=None, help="sensor field of view in degrees"
+        )
+        subparser.add_argument(
+            "--checkpoint-inputs",
+            action="store_true",
+            help="add next-checkpoint direction inputs",
+        )
+
+    train_parser = subparsers.add_parser("train", help="evolve a population")
+    add_common(train_parser)
+    train_parser.add_argument("--generations", type=int, default=50)
+    train_parser.add_argument("--workers", type=int, default=1)
+    train_parser.add_argument("--seed", type=int, default=None)
+    train_parser.add_argument("--output", default="winner.pkl")
+    train_parser.add_argument("--render", action="store_true")
+    train_parser.add_argument(
+        "--halving-min-steps",
+        type=_int_at_least(1),
+        default=None,
+        help="shortest episode horizon for successive-halving evaluation",
+    )
+    train_parser.add_argument("--halving-eta", type=_int_at_least(2), default=3)
+    train_parser.add_argument(
+        "--novelty",
+        action="store_true",
+        help="select for novel behaviour instead of reward",
+    )
+    train_parser.add_argument(
+        "--novelty-k", type=int, default=15, help="neighbours scored for novelty"
+    )
+    train_parser.add_argument(
+        "--novelty-samples",
+        type=int,
+        default=4,
+        help="trajectory positions in each behaviour descriptor",
+    )
+    train_parser.add_argument(
+        "--traffic",
+        action="store_true",
+        help="race the population together so cars see and crash into each other",
+    )
+    train_parser.add_argument("--metrics-jsonl", default=None)
+    train_parser.add_argument("--metrics-port", type=int, default=None)
+    train_parser.set_defaults(func=train)
+
+    evaluate_parser = subparsers.add_parser("evaluate", help="score a saved genome")
+    add_common(evaluate_parser)
+    evaluate_parser.add_argument("--genome", required=True)
+    evaluate_parser.set_defaults(func=evaluate)
+
+    replay_parser = subparsers.add_parser("replay", help="watch a saved genome")
+    add_common(replay_parser)
+    replay_parser.add_argument("--genome", required=True)
+    replay_parser.add_argument("--fps", type=int, default=60)
+    replay_parser.set_defaults(func=replay)
+
+    sweep_parser = subparsers.add_parser("sweep", help="tune hyperparameters")
+    add_common(sweep_parser)
+    sweep_parser.add_argument(
+        "--param",
+        action="append",
+        required=True,
+        help="key=a,b,c for choices or key=low:high for a range",
+    )
+    sweep_parser.add_argument(
+        "--samples", type=int, default=0, help="random search trials (default grid)"
+    )
+    sweep_parser.add_argument("--generations", type=int, default=16)
+    sweep_parser.add_argument("--min-generations", type=_int_at_least(1), default=2)
+    sweep_parser.add_argument("--eta", type=_int_at_least(2), default=2)
+    sweep_parser.add_argument("--workers", type=int, default=1)
+    sweep_parser.add_argument("--seed", type=int, default=0)
+    sweep_parser.add_argument("--output", default="sweep_results.csv")
+    sweep_parser.set_defaults(func=sweep)
+
+    generate_parser = subparsers.add_parser("generate", help="build a track store")
+    generate_parser.add_argument("--count", type=int, default=1000)
+    generate_parser.add_argument("--checkpoints", type=int, default=6)
+    generate_parser.add_argument("--seed", type=int, default=None)
+    generate_parser.add_argument("--output", default="tracks.npz")
+    generate_parser.set_defaults(func=generate)
+
+    tiled_parser = subparsers.add_parser(
+        "generate-tiled", help="build one large tiled map"
+    )
+    tiled_parser.add_argument("--rows", type=int, default=320)
+    tiled_parser.add_argument("--cols", type=int, default=480)
+    tiled_parser.add_argument("--lane-width", type=int, default=3)
+    tiled_parser.add_argument("--tile-size", type=int, default=500)
+    tiled_parser.add_argument("--checkpoints", type=int, default=24)
+    tiled_parser.add_argument("--seed", type=int, default=None)
+    tiled_parser.add_argument("--output", default="tiled_map")
+    tiled_parser.set_defaults(func=generate_tiled)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -11,9 +11,27 @@ class Environment(ABC):
         pass
     
     @abstractmethod
-    def step(self, action):
-        """Execute one step in the environment."""
+    def step(self, action, observe=True):
+        """Execute one step in the environment; observe=False skips the next state."""
         pass
+
+    @classmethod
+    def num_inputs(cls, sensors=None):
+        """Network input size, or None to keep the NEAT config value."""
+        return None
+
+    @classmethod
+    def get_states(cls, envs, traffic=None):
+        """Current states of several environments; traffic lets them sense each other."""
+        return [env._get_state() for env in envs]
+
+    @classmethod
+    def interact(cls, envs, traffic):
+        """
+        Resolve contact between environments stepped together and return the
+        extra reward each one earns from it.
+        """
+        return [0] * len(envs)
     
     @abstractmethod
     def _get_state(self):
@@ -26,6 +44,17 @@ class Environment(ABC):
         pass
     
     @abstractmethod
-    def render_entity(self, screen):
-        """Render the entity on screen."""
+    def render_entity(self, screen, offset=(0, 0)):
+        """Render the entity shifted by a camera offset and return the rect it covers."""
+        pass
+
+    @abstractmethod
+    def snapshot(self):
+        """Immutable render state of the entity, safe to pass between threads."""
+        pass
+
+    @classmethod
+    @abstractmethod
+    def render_snapshot(cls, screen, snapshot, offset=(0, 0)):
+        """Render a snapshot shifted by a camera offset and return the rect it covers."""
         pass
\ No newline at end of file
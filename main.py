@@ -3,7 +3,8 @@ from enum import Enum
 from race_map_creator import RaceMapCreator
 from simulation import NEATSimulation
 from race_environment import RaceEnvironment
-from track import Track
+from track import Track, save_map
+from metrics import MetricsCollector, JsonlExporter
 
 
 class GameType(Enum):
@@ -143,6 +144,7 @@ def run_game_session(screen, font, game_config):
                         continue
 
                     pygame.image.save(track_surface, "track.png")
+                    save_map("track.npz", track_surface, start_pos, checkpoints)
                     print(f"Map saved! Start position: {start_pos}")
                     print(f"Checkpoints: {checkpoints}")
                     print("Starting NEAT simulation...")
@@ -154,6 +156,7 @@ def run_game_session(screen, font, game_config):
                         environment_class=game_config.environment_class,
                         world_class=game_config.world_class,
                         max_steps=game_config.max_steps,
+                        metrics=MetricsCollector([JsonlExporter("metrics.jsonl")]),
                     )
                     simulation.run()
                     return True
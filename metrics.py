@@ -0,0 +1,231 @@
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MetricsCollector:
+    """
+    Keeps rolling training counters in memory and hands them to exporters.
+    Exporters that write out every record (batched = True) get them in batches of
+    flush_every generations; the others see each record as soon as it is made.
+    Recording is cheap (a few integer additions per step) so it can stay enabled
+    at large population sizes.
+    """
+
+    def __init__(self, exporters=None, window=20, flush_every=5):
+        self.exporters = list(exporters or [])
+        self.window = window
+        self.flush_every = flush_every
+
+        self.env_steps_total = 0
+        self.generations_total = 0
+        self.checkpoints_passed_total = 0
+
+        self._generation_times = deque(maxlen=window)
+        self._generation_steps = deque(maxlen=window)
+        self._generation_ends = deque(maxlen=window + 1)
+        self._pending = []
+        self._lock = threading.Lock()
+
+        self._reset_generation(0, 0)
+
+    def _reset_generation(self, generation, population_size):
+        """Clear the per-generation counters."""
+        self.generation = generation
+        self.population_size = population_size
+        self._generation_start = time.perf_counter()
+        self._steps_this_generation = 0
+        self._alive_curve = []
+
+    def start_generation(self, generation, population_size):
+        """Mark the start of a generation's evaluation."""
+        self._reset_generation(generation, population_size)
+
+    def record_step(self, alive_count):
+        """Record one simulation step in which alive_count entities were stepped."""
+        self._steps_this_generation += alive_count
+        self._alive_curve.append(alive_count)
+
+    def record_episodes(self, episode_lengths):
+        """Record a generation from per-genome episode lengths instead of lockstep steps."""
+        alive_from = [0]
+        for length in episode_lengths:
+            if length >= len(alive_from):
+                alive_from.extend([0] * (length + 1 - len(alive_from)))
+            alive_from[length] += 1
+
+        alive = sum(alive_from)
+        for step in range(len(alive_from) - 1):
+            alive -= alive_from[step]
+            self.record_step(alive)
+
+    def end_generation(self, fitnesses, checkpoints_passed=0):
+        """Close the current generation and queue its record for export."""
+        now = time.perf_counter()
+        elapsed = now - self._generation_start
+        fitnesses = list(fitnesses)
+
+        with self._lock:
+            self.env_steps_total += self._steps_this_generation
+            self.generations_total += 1
+            self.checkpoints_passed_total += checkpoints_passed
+            self._generation_times.append(elapsed)
+            self._generation_steps.append(self._steps_this_generation)
+            self._generation_ends.append(now)
+
+            record = self._snapshot_locked()
+            record.update(
+                {
+                    "timestamp": time.time(),
+                    "generation_seconds": elapsed,
+                    "generation_env_steps": self._steps_this_generation,
+                    "checkpoints_passed": checkpoints_passed,
+                    "best_fitness": max(fitnesses) if fitnesses else 0.0,
+                    "mean_fitness": (
+                        sum(fitnesses) / len(fitnesses) if fitnesses else 0.0
+                    ),
+                    "alive_curve": self._alive_curve,
+                }
+            )
+            self._pending.append(record)
+
+        for exporter in self.exporters:
+            if not exporter.batched:
+                exporter.export([record])
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+        return record
+
+    def _snapshot_locked(self):
+        """Build the rolling counters; caller must hold the lock."""
+        total_time = sum(self._generation_times)
+        steps_per_second = (
+            sum(self._generation_steps) / total_time if total_time > 0 else 0.0
+        )
+
+        generations_per_minute = 0.0
+        if len(self._generation_ends) > 1:
+            span = self._generation_ends[-1] - self._generation_ends[0]
+            if span > 0:
+                generations_per_minute = (len(self._generation_ends) - 1) * 60 / span
+
+        return {
+            "generation": self.generation,
+            "population_size": self.population_size,
+            "env_steps_total": self.env_steps_total,
+            "generations_total": self.generations_total,
+            "checkpoints_passed_total": self.checkpoints_passed_total,
+            "env_steps_per_second": steps_per_second,
+            "generations_per_minute": generations_per_minute,
+        }
+
+    def snapshot(self):
+        """Return the current rolling counters as a dict."""
+        with self._lock:
+            return self._snapshot_locked()
+
+    def flush(self):
+        """Send all queued generation records to the batched exporters."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+        for exporter in self.exporters:
+            if exporter.batched:
+                exporter.export(batch)
+
+    def close(self):
+        """Flush outstanding records and shut down exporters."""
+        self.flush()
+        for exporter in self.exporters:
+            exporter.close()
+
+
+class JsonlExporter:
+    """Appends one JSON object per generation to a file."""
+
+    batched = True
+
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, records):
+        """Write a batch of generation records."""
+        with open(self.path, "a") as file:
+            file.write("".join(json.dumps(record) + "\n" for record in records))
+
+    def close(self):
+        pass
+
+
+class PrometheusExporter:
+    """
+    Serves the most recent generation record in Prometheus text format
+    on http://host:port/metrics from a daemon thread.
+    """
+
+    batched = False
+
+    PREFIX = "neat_arcade"
+    METRICS = [
+        ("env_steps_total", "counter", "Environment steps simulated"),
+        ("generations_total", "counter", "Generations evaluated"),
+        ("checkpoints_passed_total", "counter", "Checkpoints passed by all genomes"),
+        ("env_steps_per_second", "gauge", "Rolling environment steps per second"),
+        ("generations_per_minute", "gauge", "Rolling generations per minute"),
+        ("generation", "gauge", "Current generation"),
+        ("population_size", "gauge", "Genomes in the current generation"),
+        ("best_fitness", "gauge", "Best fitness of the last generation"),
+        ("mean_fitness", "gauge", "Mean fitness of the last generation"),
+    ]
+
+    def __init__(self, host="127.0.0.1", port=8000):
+        self._latest = {}
+        self._lock = threading.Lock()
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def export(self, records):
+        """Keep only the newest record; Prometheus scrapes the current value."""
+        with self._lock:
+            self._latest = dict(records[-1])
+
+    def render(self):
+        """Format the latest record as Prometheus exposition text."""
+        with self._lock:
+            latest = self._latest
+
+        lines = []
+        for name, metric_type, description in self.METRICS:
+            if name not in latest:
+                continue
+            full_name = f"{self.PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {description}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            lines.append(f"{full_name} {float(latest[name])}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,230 @@
+import numpy as np
+
+
+class Trajectory:
+    """
+    Positions of one episode sampled every interval steps, reduced to a behaviour
+    descriptor: the sampled positions, the final position and checkpoints passed.
+    """
+
+    __slots__ = ("interval", "samples", "positions", "final_position")
+
+    def __init__(self, max_steps, samples=4):
+        self.interval = max(max_steps // (samples + 1), 1)
+        self.samples = samples
+        self.positions = []
+        self.final_position = None
+
+    def reset(self):
+        self.positions = []
+        self.final_position = None
+
+    def observe(self, step, position):
+        """Record the position reached after step steps."""
+        self.final_position = position
+        if step % self.interval == 0 and len(self.positions) < self.samples:
+            self.positions.append(position)
+
+    def descriptor(self, world, checkpoints_passed):
+        """
+        Behaviour vector with positions scaled to the world size and checkpoints
+        counted in laps. Samples the car did not live to reach repeat where it died.
+        """
+        final = self.final_position or world.start_position
+        positions = self.positions + [final] * (self.samples + 1 - len(self.positions))
+        scaled = np.array(positions, dtype=np.float64) / (world.width, world.height)
+        laps = checkpoints_passed / max(len(world.checkpoints), 1)
+        return np.append(scaled.ravel(), laps)
+
+
+class KDTree:
+    """
+    Static k-d tree over an (n, d) array for k-nearest-neighbour distances.
+    Nodes split at the median of their widest dimension; leaves hold up to
+    leaf_size points, which are scanned with numpy.
+    """
+
+    def __init__(self, points, leaf_size=128):
+        self.leaf_size = leaf_size
+        order = np.arange(len(points))
+        # Per node: split dimension (-1 for a leaf), split value, children, point range
+        self.dims, self.values, self.children, self.ranges = [], [], [], []
+
+        stack = [(0, len(points), None, 0)]
+        while stack:
+            start, end, parent, side = stack.pop()
+            node = len(self.dims)
+            if parent is not None:
+                self.children[parent][side] = node
+            self.ranges.append((start, end))
+            self.children.append([None, None])
+
+            if end - start <= leaf_size:
+                self.dims.append(-1)
+                self.values.append(0.0)
+                continue
+
+            block = points[order[start:end]]
+            dim = int(np.argmax(block.max(axis=0) - block.min(axis=0)))
+            middle = (end - start) // 2
+            part = np.argpartition(block[:, dim], middle)
+            order[start:end] = order[start:end][part]
+            self.dims.append(dim)
+            self.values.append(float(points[order[start + middle], dim]))
+            stack.append((start + middle, end, node, 1))
+            stack.append((start, start + middle, node, 0))
+
+        self.points = points[order]
+
+    def __len__(self):
+        return len(self.points)
+
+    def query(self, point, k):
+        """Squared distances to the k nearest points, ascending (fewer if the tree is small)."""
+        best = np.full(k, np.inf)
+        self._search(0, point, best, np.zeros(len(point)), 0.0)
+        return best[np.isfinite(best)]
+
+    def _search(self, node, point, best, gaps, bound):
+        """
+        Depth-first search, nearer child first. gaps holds the distance from point
+        to the node's cell along each split dimension, so bound is a lower bound on
+        the squared distance to anything in the node.
+        """
+        dim = self.dims[node]
+        if dim < 0:
+            start, end = self.ranges[node]
+            distances = ((self.points[start:end] - point) ** 2).sum(axis=1)
+            merged = np.concatenate([best, distances])
+            k = len(best)
+            best[:] = np.partition(merged, k - 1)[:k] if len(merged) > k else merged
+            best.sort()
+            return
+
+        gap = point[dim] - self.values[node]
+        near, far = self.children[node] if gap < 0 else self.children[node][::-1]
+        self._search(near, point, best, gaps, bound)
+
+        old_gap = gaps[dim]
+        far_bound = bound - old_gap * old_gap + gap * gap
+        if far_bound < best[-1]:
+            gaps[dim] = gap
+            self._search(far, point, best, gaps, far_bound)
+            gaps[dim] = old_gap
+
+
+class NoveltyArchive:
+    """
+    Archive of behaviour descriptors for novelty search.
+
+    A genome's novelty is its mean distance to the k nearest behaviours among
+    the archive and the rest of its generation. Behaviours more novel than
+    threshold are archived; the threshold rises when a generation adds more
+    than max_additions and decays after stall generations that add none.
+
+    Archived descriptors live in a KDTree, rebuilt every rebuild_every
+    additions; entries added since the last build are compared directly.
+    """
+
+    def __init__(
+        self,
+        k=15,
+        samples=4,
+        threshold=0.1,
+        max_additions=4,
+        stall=5,
+        leaf_size=128,
+        rebuild_every=1024,
+    ):
+        self.k = k
+        self.samples = samples
+        self.threshold = threshold
+        self.max_additions = max_additions
+        self.stall = stall
+        self.leaf_size = leaf_size
+        self.rebuild_every = rebuild_every
+
+        self.descriptors = None
+        self.size = 0
+        self.tree = None
+        self.generations_without_additions = 0
+
+    def __len__(self):
+        return self.size
+
+    def trajectory(self, max_steps):
+        """A trajectory recorder producing descriptors for this archive."""
+        return Trajectory(max_steps, self.samples)
+
+    def _pending(self):
+        """Archived descriptors not yet in the tree."""
+        built = len(self.tree) if self.tree is not None else 0
+        return self.descriptors[built : self.size]
+
+    def _nearest(self, descriptor):
+        """Squared distances from descriptor to its k nearest archived behaviours."""
+        distances = [((self._pending() - descriptor) ** 2).sum(axis=1)]
+        if self.tree is not None:
+            distances.append(self.tree.query(descriptor, self.k))
+        distances = np.concatenate(distances)
+        if len(distances) > self.k:
+            distances = np.partition(distances, self.k - 1)[: self.k]
+        return distances
+
+    def score(self, descriptors):
+        """Novelty of each row of a (genomes, d) batch of descriptors."""
+        # Squared distances to the rest of the batch one row at a time, as
+        # |a|^2 + |b|^2 - 2ab, so memory stays linear in the population
+        norms = (descriptors**2).sum(axis=1)
+
+        scores = np.empty(len(descriptors))
+        for i, descriptor in enumerate(descriptors):
+            distances = np.maximum(norms + norms[i] - 2 * descriptors @ descriptor, 0)
+            distances[i] = np.inf
+            if self.size:
+                distances = np.concatenate([distances, self._nearest(descriptor)])
+            distances = distances[np.isfinite(distances)]
+            if len(distances) > self.k:
+                distances = np.partition(distances, self.k - 1)[: self.k]
+            scores[i] = np.sqrt(distances).mean() if len(distances) else 0.0
+        return scores
+
+    def add(self, descriptors):
+        """Append descriptors to the archive, rebuilding the tree when it is stale."""
+        if self.descriptors is None:
+            self.descriptors = np.empty(
+                (max(len(descriptors), 1024), descriptors.shape[1])
+            )
+        if self.size + len(descriptors) > len(self.descriptors):
+            grown = np.empty((2 * (self.size + len(descriptors)), descriptors.shape[1]))
+            grown[: self.size] = self.descriptors[: self.size]
+            self.descriptors = grown
+        self.descriptors[self.size : self.size + len(descriptors)] = descriptors
+        self.size += len(descriptors)
+
+        built = len(self.tree) if self.tree is not None else 0
+        if self.size - built >= self.rebuild_every:
+            self.tree = KDTree(self.descriptors[: self.size], self.leaf_size)
+
+    def evaluate(self, descriptors):
+        """
+        Score a generation and archive its novel behaviours.
+
+        Returns:
+            array of novelty scores, one per descriptor.
+        """
+        descriptors = np.asarray(descriptors, dtype=np.float64)
+        scores = self.score(descriptors)
+
+        novel = descriptors[scores > self.threshold]
+        if len(novel):
+            self.add(novel)
+            self.generations_without_additions = 0
+        else:
+            self.generations_without_additions += 1
+
+        if len(novel) > self.max_additions:
+            self.threshold *= 1.2
+        elif self.generations_without_additions >= self.stall:
+            self.threshold *= 0.95
+        return scores
@@ -1,8 +1,7 @@
-import numpy as np
-import pygame
 from track import Track
 from car import Car
 from environment import Environment
+from sensors import SensorArray
 
 
 class RaceEnvironment(Environment):
@@ -14,28 +13,87 @@ class RaceEnvironment(Environment):
     SCREEN_WIDTH = 1200  # TODO this should probably be moved up to simulation
     SCREEN_HEIGHT = 800
     MAX_STEPS = 1200
+    CRASH_REWARD = -200
 
-    def __init__(self, track):
+    def __init__(self, track, sensors=None, max_steps=None):
 
         self.track = track
-        self.car = Car(self.track.start_position, self.track.start_angle)
+        self.car = Car(self.track.start_position, self.track.start_angle, sensors)
+        self.max_steps = max_steps or self.MAX_STEPS
 
         self.current_step = 0
         self.last_distance = 0
+        self.traffic_group = 0
 
     def reset(self):
         """Reset the environment to its initial state."""
         self.car.reset(self.track.start_position, self.track.start_angle)
         self.current_step = 0
         self.last_distance = 0
-        return np.array(self._get_state(), dtype=np.float32)
+        self.traffic_group = 0
+        return self._get_state()
 
-    def step(self, action):
+    @classmethod
+    def num_inputs(cls, sensors=None):
+        """Network input size for the given sensor array."""
+        return (sensors or SensorArray()).num_inputs
+
+    @classmethod
+    def get_states(cls, envs, traffic=None):
+        """
+        States of several environments on the same track, in one sensor pass.
+        With traffic the cars also see each other through their rays.
+        """
+        if not envs:
+            return []
+        cars = [env.car for env in envs]
+        track = envs[0].track
+        states = cars[0].sensors.read(
+            track,
+            [car.position for car in cars],
+            [car.angle for car in cars],
+            [car.speed for car in cars],
+            cars[0].min_speed,
+            cars[0].max_speed,
+            [car.next_checkpoint(track) for car in cars],
+            traffic,
+            groups=[env.traffic_group for env in envs],
+        )
+        for i, car in enumerate(cars):
+            if not car.is_alive:
+                states[i] = 0
+        return states
+
+    @classmethod
+    def interact(cls, envs, traffic):
+        """
+        Crash every live car that touches a car outside its traffic group, at
+        CRASH_REWARD each, and regroup the survivors.
+        """
+        alive = [i for i, env in enumerate(envs) if env.car.is_alive]
+        rewards = [0] * len(envs)
+        if len(alive) < 2:
+            return rewards
+
+        crashed, groups = traffic.collisions(
+            [envs[i].car.position for i in alive],
+            [envs[i].traffic_group for i in alive],
+        )
+        for i, hit, group in zip(alive, crashed, groups):
+            envs[i].traffic_group = group
+            if hit:
+                envs[i].car.kill_car()
+                rewards[i] = cls.CRASH_REWARD
+        return rewards
+
+    def step(self, action, observe=True):
         """
         Execute one step in the environment.
 
         Args:
             action (int): The action to take (0-6).
+            observe (bool): Compute the next state; callers that batch
+                states with get_states pass False and receive None.
 
         Returns:
             tuple: (state, reward, done, info)
@@ -47,17 +105,18 @@ class RaceEnvironment(Environment):
 
         reward = self._calculate_reward()
         done = self._is_done()
-        state = self._get_state()
+        state = self._get_state() if observe else None
 
         info = {
             "distance_traveled": self.car.total_distance,
             "is_alive": self.car.is_alive,
             "speed": self.car.speed,
             "position": self.car.position.copy(),
-            "crashed": not self.car.is_alive and self.current_step < self.MAX_STEPS,
+            "checkpoints_passed": self.car.checkpoints_passed,
+            "crashed": not self.car.is_alive and self.current_step < self.max_steps,
         }
 
-        return np.array(state, dtype=np.float32), reward, done, info
+        return state, reward, done, info
 
     def _execute_action(self, action):
         """Apply the chosen action to the car."""
@@ -77,13 +136,15 @@ class RaceEnvironment(Environment):
         if not self.car.is_alive:
             return
 
-        if not self.track.is_on_track(self.car.position):
+        if not self.track.is_on_track(self.car.position) or self.track.crosses_wall(
+            self.car.last_position, self.car.position
+        ):
             self.car.kill_car()
 
     def _calculate_reward(self):
         """Reward for distance progress and staying alive."""
         if not self.car.is_alive:
-            return -200  # TODO magic numbers in function
+            return self.CRASH_REWARD  # TODO magic numbers in function
 
         total_reward = 0
         delta_distance = self.car.total_distance - self.last_distance
@@ -109,12 +170,21 @@ class RaceEnvironment(Environment):
 
     def _is_done(self):
         """Episode ends on death or max steps."""
-        return not self.car.is_alive or self.current_step >= self.MAX_STEPS
+        return not self.car.is_alive or self.current_step >= self.max_steps
 
     def is_alive(self):
         """Check if car is still alive."""
         return self.car.is_alive
 
-    def render_entity(self, screen):
-        """Render the car on screen."""
-        self.car.render(screen)
+    def render_entity(self, screen, offset=(0, 0)):
+        """Render the car on screen and return the dirty rect."""
+        return self.car.render(screen, offset)
+
+    def snapshot(self):
+        """Render state of the car, copied so the simulation can keep stepping."""
+        return self.car.snapshot()
+
+    @classmethod
+    def render_snapshot(cls, screen, snapshot, offset=(0, 0)):
+        """Render a car snapshot on screen and return the dirty rect."""
+        return Car.render_snapshot(screen, snapshot, offset)
@@ -2,6 +2,8 @@ import pygame
 from enum import Enum
 from typing import List, Tuple, Optional
 
+from track import CORNER_CONFIGS, GRID_SIZE, MAP_HEIGHT, MAP_WIDTH
+
 
 class EditMode(Enum):
     TRACK = 1
@@ -19,11 +21,15 @@ class Colors:
 
 
 class RaceMapCreator:
+    WIDTH = MAP_WIDTH
+    HEIGHT = MAP_HEIGHT
+    GRID_SIZE = GRID_SIZE
+
     def __init__(self, screen: pygame.Surface):
         self.screen = screen
-        self.width = 1200
-        self.height = 800
-        self.grid_size = 25
+        self.width = self.WIDTH
+        self.height = self.HEIGHT
+        self.grid_size = self.GRID_SIZE
         self.cols = self.width // self.grid_size
         self.rows = self.height // self.grid_size
 
@@ -135,19 +141,12 @@ class RaceMapCreator:
 
     def _add_corner_smoothing(self, surface: pygame.Surface) -> None:
         """Add triangular smoothing to inner corners of L-shaped tracks."""
-        corner_configs = [
-            (-1, 0, 0, -1, [(0, 0), (1, 0), (0, 1)]),  # Top-left L
-            (-1, 0, 0, 1, [(1, 0), (0, 0), (1, 1)]),  # Top-right L
-            (1, 0, 0, -1, [(0, 1), (0, 0), (1, 1)]),  # Bottom-left L
-            (1, 0, 0, 1, [(1, 1), (0, 1), (1, 0)]),  # Bottom-right L
-        ]
-
         for row in range(self.rows):
             for col in range(self.cols):
                 if not self._is_track_edge(row, col):
                     x, y = col * self.grid_size, row * self.grid_size
 
-                    for dr1, dc1, dr2, dc2, offsets in corner_configs:
+                    for dr1, dc1, dr2, dc2, offsets in CORNER_CONFIGS:
                         triangle_points = [
                             (x + ox * self.grid_size, y + oy * self.grid_size)
                             for ox, oy in offsets
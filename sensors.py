@@ -0,0 +1,138 @@
+import numpy as np
+
+
+class SensorArray:
+    """
+    Distance sensors for a car, read for every ray of every car in one numpy pass.
+
+    Rays are spread evenly over fov degrees, or placed at explicit angles.
+    Optionally two more inputs give the direction of the next checkpoint
+    relative to the heading.
+    """
+
+    DEFAULT_ANGLES = (-75, -35, 0, 35, 75)
+
+    def __init__(
+        self,
+        num_rays=None,
+        fov=150,
+        angles=None,
+        max_distance=200,
+        sensor_range=100,
+        step_size=2,
+        checkpoint_inputs=False,
+    ):
+        if angles is None:
+            if num_rays is None:
+                angles = self.DEFAULT_ANGLES
+            elif num_rays == 1:
+                angles = (0,)
+            else:
+                angles = np.linspace(-fov / 2, fov / 2, num_rays)
+        self.angles = np.asarray(angles, dtype=np.float64)
+        self.max_distance = max_distance
+        self.sensor_range = sensor_range
+        self.checkpoint_inputs = checkpoint_inputs
+        self.sample_distances = np.arange(0, max_distance, step_size, dtype=np.float64)
+
+    @property
+    def num_rays(self):
+        return len(self.angles)
+
+    @property
+    def num_inputs(self):
+        """Network inputs: rays, speed, heading vector and checkpoint direction."""
+        return self.num_rays + 3 + (2 if self.checkpoint_inputs else 0)
+
+    def ray_distances(self, track, positions, headings, traffic=None, groups=None):
+        """
+        Distance to the nearest wall along every ray.
+
+        Intersects the track's wall segments, so one car and a batch read the
+        same exact distances. Tracks without walls (TiledTrack) fall back to
+        the first off-track sample every step_size pixels. With traffic, rays
+        also stop at the cars in positions whose groups differ from their own.
+
+        Args:
+            positions: (cars, 2) array of x, y.
+            headings: (cars,) array of car angles in degrees.
+
+        Returns:
+            (cars, rays) array, max_distance where no wall was hit.
+        """
+        ray_angles = np.radians(headings[:, None] + self.angles[None, :])
+        distances = self._wall_distances(track, positions, ray_angles)
+        if traffic is not None:
+            distances = np.minimum(
+                distances,
+                traffic.ray_distances(positions, ray_angles, self.max_distance, groups),
+            )
+        return distances
+
+    def _wall_distances(self, track, positions, ray_angles):
+        walls = track.get_walls()
+        if walls is not None:
+            return walls.ray_distances(positions, ray_angles, self.max_distance)
+
+        xs = (
+            positions[:, 0, None, None]
+            + self.sample_distances * np.cos(ray_angles)[..., None]
+        )
+        ys = (
+            positions[:, 1, None, None]
+            + self.sample_distances * np.sin(ray_angles)[..., None]
+        )
+
+        off_track = ~track.are_on_track(xs, ys)
+        hit = off_track.any(axis=-1)
+        first_off = off_track.argmax(axis=-1)
+        return np.where(hit, self.sample_distances[first_off], self.max_distance)
+
+    def read(
+        self,
+        track,
+        positions,
+        headings,
+        speeds,
+        min_speed,
+        max_speed,
+        targets=None,
+        traffic=None,
+        groups=None,
+    ):
+        """
+        Normalized network inputs for a batch of cars.
+
+        Args:
+            targets: (cars, 2) positions of each car's next checkpoint, needed
+                when checkpoint_inputs is enabled.
+            traffic: a Traffic, so rays also see the other cars in the batch.
+            groups: each car's traffic group, needed with traffic.
+
+        Returns:
+            (cars, num_inputs) float32 array.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        headings = np.asarray(headings, dtype=np.float64)
+        speeds = np.asarray(speeds, dtype=np.float64)
+
+        rays = np.minimum(
+            self.ray_distances(track, positions, headings, traffic, groups)
+            / self.sensor_range,
+            1.0,
+        )
+        rad = np.radians(headings)
+        normalized_speed = (speeds - min_speed) / (max_speed - min_speed) * 2 - 1
+        columns = [
+            rays,
+            normalized_speed[:, None],
+            np.cos(rad)[:, None],
+            np.sin(rad)[:, None],
+        ]
+
+        if self.checkpoint_inputs:
+            offsets = np.asarray(targets, dtype=np.float64).reshape(-1, 2) - positions
+            relative = np.arctan2(offsets[:, 1], offsets[:, 0]) - rad
+            columns += [np.cos(relative)[:, None], np.sin(relative)[:, None]]
+
+        return np.hstack(columns).astype(np.float32)
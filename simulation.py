@@ -1,14 +1,221 @@
+import copy
+import math
+import queue
+import threading
+import time
+
 import neat
-import pygame
 import numpy as np
 
+_worker_context = None
+_worker_env = None
+_worker_trajectory = None
+
+
+def make_environment(environment_class, world, sensors=None, max_steps=None):
+    """
+    Build an environment, passing a sensor array and an episode length only
+    when they are configured.
+    """
+    kwargs = {}
+    if sensors is not None:
+        kwargs["sensors"] = sensors
+    if max_steps is not None:
+        kwargs["max_steps"] = max_steps
+    return environment_class(world, **kwargs)
+
+
+def load_config(config_path, num_inputs=None):
+    """
+    Load a NEAT config, overriding num_inputs when the environment's sensors
+    determine the network input size.
+    """
+    config = neat.Config(
+        neat.DefaultGenome,
+        neat.DefaultReproduction,
+        neat.DefaultSpeciesSet,
+        neat.DefaultStagnation,
+        config_path,
+    )
+    if num_inputs is not None:
+        config.genome_config.num_inputs = num_inputs
+        config.genome_config.input_keys = [-i - 1 for i in range(num_inputs)]
+    return config
+
+
+def evaluate_genome(
+    genome, config, world, environment_class, max_steps, env=None, trajectory=None
+):
+    """
+    Run one genome headless until its episode ends.
+    Pass env to reuse an existing environment instead of building a new one,
+    and a novelty Trajectory to record the positions the car passes through.
+
+    Returns:
+        tuple: (fitness, steps, checkpoints_passed)
+    """
+    net = neat.nn.FeedForwardNetwork.create(genome, config)
+    if env is None:
+        env = make_environment(environment_class, world, max_steps=max_steps)
+    state = env.reset()
+    if trajectory is not None:
+        trajectory.reset()
+
+    fitness = 0
+    steps = 0
+    checkpoints_passed = 0
+    done = False
+    while not done and steps < max_steps:
+        action = np.argmax(net.activate(state))
+        state, reward, done, info = env.step(action)
+        fitness += reward
+        checkpoints_passed = info.get("checkpoints_passed", 0)
+        steps += 1
+        if trajectory is not None:
+            trajectory.observe(steps, info["position"])
+
+    return fitness, steps, checkpoints_passed
+
+
+def evaluate_behavior(
+    genome, config, world, environment_class, max_steps, env, trajectory
+):
+    """
+    evaluate_genome plus the behaviour descriptor of the episode, or None
+    without a trajectory.
+
+    Returns:
+        tuple: (fitness, steps, checkpoints_passed, descriptor)
+    """
+    fitness, steps, checkpoints_passed = evaluate_genome(
+        genome, config, world, environment_class, max_steps, env, trajectory
+    )
+    descriptor = None
+    if trajectory is not None:
+        descriptor = trajectory.descriptor(world, checkpoints_passed)
+    return fitness, steps, checkpoints_passed, descriptor
+
+
+def _init_worker(world, environment_class, max_steps, sensors=None, trajectory=None):
+    """Store the shared world and a reusable environment once per worker process."""
+    global _worker_context, _worker_env, _worker_trajectory
+    _worker_context = (world, environment_class, max_steps)
+    _worker_env = make_environment(environment_class, world, sensors, max_steps)
+    _worker_trajectory = trajectory
+
+
+def _evaluate_in_worker(genome_and_config):
+    genome, config = genome_and_config
+    return evaluate_behavior(
+        genome, config, *_worker_context, _worker_env, _worker_trajectory
+    )
+
+
+class Entity:
+    """Evaluation state for one genome, pooled and reused across generations."""
+
+    __slots__ = (
+        "env",
+        "genome",
+        "net",
+        "fitness",
+        "checkpoints_passed",
+        "position",
+        "steps",
+        "done",
+        "trajectory",
+    )
+
+    def __init__(self, env, trajectory=None):
+        self.env = env
+        self.trajectory = trajectory
+        self.position = (0, 0)
+        self.genome = None
+        self.net = None
+        self.fitness = 0
+        self.checkpoints_passed = 0
+        self.steps = 0
+        self.done = False
+
+    def advance(self, horizon):
+        """Step the episode headless until it ends or reaches horizon steps."""
+        state = self.env._get_state()
+        while not self.done and self.steps < horizon:
+            action = np.argmax(self.net.activate(state))
+            state, reward, self.done, info = self.env.step(action)
+            self.fitness += reward
+            self.checkpoints_passed = info.get("checkpoints_passed", 0)
+            self.steps += 1
+
+
+class Frame:
+    """Snapshot of one visual simulation step, published to the UI thread."""
+
+    __slots__ = (
+        "generation",
+        "step",
+        "alive",
+        "best_fitness",
+        "leader",
+        "entities",
+    )
+
+    def __init__(self, generation, step, alive, best_fitness, leader, entities):
+        self.generation = generation
+        self.step = step
+        self.alive = alive
+        self.best_fitness = best_fitness
+        self.leader = leader
+        self.entities = entities
+
+
+class SimulationStopped(Exception):
+    """Raised in the simulation thread when the window asks it to quit."""
+
+
+class GlyphCache:
+    """Renders each character once and draws strings from the cached glyphs."""
+
+    def __init__(self, font, color):
+        self.font = font
+        self.color = color
+        self.glyphs = {}
+
+    def render(self, surface, text, position):
+        """Draw text at position and return the rect it covers."""
+        import pygame
+
+        x, y = position
+        height = 0
+        for char in text:
+            glyph = self.glyphs.get(char)
+            if glyph is None:
+                glyph = self.font.render(char, True, self.color)
+                self.glyphs[char] = glyph
+            surface.blit(glyph, (x, y))
+            x += glyph.get_width()
+            height = max(height, glyph.get_height())
+        return pygame.Rect(position[0], y, x - position[0], height)
+
 
 class NEATSimulation:
     """
     NEAT-based simulation that evolves neural networks.
-    All entities drive simultaneously and are always rendered.
+    With a screen, all entities drive simultaneously in a simulation thread
+    that publishes a Frame per step; the main thread renders the latest frame
+    and turns window events into pause, speed and quit commands.
+    Without one (screen=None) genomes are evaluated headless, optionally
+    across a pool of worker processes, and pygame is never imported.
+    With a NoveltyArchive, genomes are selected for novel behaviour instead of
+    reward, and the genome with the best reward is returned.
+    With a Traffic, entities race each other: they are always stepped together,
+    in this process, and sense and crash into the other cars.
     """
 
+    # Simulation steps per second at 1x; speed 0 runs unthrottled
+    STEPS_PER_SECOND = 60
+    SPEEDS = (1, 2, 4, 8, 0)
+
     def __init__(
         self,
         start,
@@ -18,15 +225,70 @@ class NEATSimulation:
         world_class,
         max_steps,
         config_path="config-feedforward.txt",
+        metrics=None,
+        world=None,
+        workers=1,
+        halving_min_steps=None,
+        halving_eta=3,
+        sensors=None,
+        novelty=None,
+        traffic=None,
     ):
+        if halving_min_steps is not None and halving_min_steps < 1:
+            raise ValueError("halving_min_steps must be at least 1")
+        if halving_min_steps and halving_eta < 2:
+            raise ValueError("halving_eta must be at least 2")
+        if screen is not None and halving_min_steps:
+            raise ValueError("halving evaluates headless and cannot render")
+        if workers > 1 and halving_min_steps:
+            raise ValueError(
+                "halving evaluates in this process and cannot use worker processes"
+            )
+        if novelty is not None and halving_min_steps:
+            raise ValueError(
+                "novelty search scores whole episodes and cannot use halving"
+            )
+        if traffic is not None and halving_min_steps:
+            raise ValueError("traffic needs every car on track and cannot use halving")
+        if traffic is not None and workers > 1:
+            raise ValueError(
+                "traffic steps every car together in this process and cannot use "
+                "worker processes"
+            )
         self.config_path = config_path
+        self.metrics = metrics
         self.generation = 0
-        self.world = None
-
-        pygame.init()
-        pygame.display.set_caption("NEAT Racing")
-        self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, 36)
+        self.world = world
+        self.workers = workers
+        self.pool = None
+        self.entity_pool = []
+        self.headless_env = None
+        self.headless_trajectory = None
+        self.halving_min_steps = halving_min_steps
+        self.halving_eta = halving_eta
+        self.sensors = sensors
+        self.novelty = novelty
+        self.champion = None
+        self.traffic = traffic
+
+        if screen is not None:
+            import pygame
+
+            pygame.init()
+            pygame.display.set_caption("NEAT Racing")
+            self.clock = pygame.time.Clock()
+            self.font = pygame.font.Font(None, 36)
+            self.glyphs = GlyphCache(self.font, (255, 255, 255))
+        self.background = None
+        self.dirty_rects = None
+        self.frames = queue.Queue(maxsize=2)
+        self.commands = queue.Queue()
+        # Shown and changed by the window thread only
+        self.speed = 1
+        self.paused = False
+        # The simulation thread's copy of speed, updated through commands
+        self.simulation_speed = 1
+        self.rendered_generation = None
         self.start = start
         self.checkpoints = checkpoints
 
@@ -41,125 +303,498 @@ class NEATSimulation:
         Evaluate all genomes in the population.
         """
         self.generation += 1
-        print(f"Generation {self.generation}")
 
-        if self.world is None:
-            screen_width = self.screen.get_width()
-            screen_height = self.screen.get_height()
-            self.world = self.world_class(
-                screen_width, screen_height, self.start, self.checkpoints
-            )
+        if self.screen is None and self.traffic is None:
+            self._eval_genomes_headless(genomes, config)
+            return
+        self._eval_genomes_lockstep(genomes, config)
 
-        entities_data = []
-        for genome_id, genome in genomes:
-            net = neat.nn.FeedForwardNetwork.create(genome, config)
-            env = self.environment_class(self.world)
-            env.reset()
-            entities_data.append(
-                {
-                    "genome_id": genome_id,
-                    "genome": genome,
-                    "net": net,
-                    "env": env,
-                    "fitness": 0,
-                }
-            )
+    def _eval_genomes_lockstep(self, genomes, config):
+        """
+        Drive every entity one step at a time, together. With a screen each step
+        is published as a Frame and paced to the chosen speed; with traffic the
+        entities sense and crash into each other.
+        """
+        visual = self.screen is not None
+        if visual:
+            print(f"Generation {self.generation}")
+
+        entities = self._acquire_entities(genomes, config)
+
+        if self.metrics:
+            self.metrics.start_generation(self.generation, len(entities))
 
         step = 0
-        running = True
+        next_step_at = time.perf_counter()
 
-        while running and step < self.max_steps:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                    return
+        while step < self.max_steps:
+            if visual:
+                self._handle_commands()
+
+            alive = [entity for entity in entities if entity.env.is_alive()]
+            alive_count = len(alive)
+            states = self.environment_class.get_states(
+                [entity.env for entity in alive], self.traffic
+            )
+            for entity, state in zip(alive, states):
+                output = entity.net.activate(state)
+                action = np.argmax(output)
 
-            alive_count = 0
-            for entity_data in entities_data:
-                if entity_data["env"].is_alive():
-                    alive_count += 1
+                _, reward, done, info = entity.env.step(action, observe=False)
+                entity.fitness += reward
+                entity.checkpoints_passed = info.get("checkpoints_passed", 0)
+                entity.position = info.get("position", entity.position)
+                if entity.trajectory is not None:
+                    entity.trajectory.observe(step + 1, entity.position)
 
-                    state = entity_data["env"]._get_state()
-                    output = entity_data["net"].activate(state)
-                    action = np.argmax(output)
+                entity.genome.fitness = entity.fitness
 
-                    _, reward, done, info = entity_data["env"].step(action)
-                    entity_data["fitness"] += reward
+            if self.traffic is not None:
+                rewards = self.environment_class.interact(
+                    [entity.env for entity in alive], self.traffic
+                )
+                for entity, reward in zip(alive, rewards):
+                    entity.fitness += reward
+                    entity.genome.fitness = entity.fitness
 
-                    entity_data["genome"].fitness = entity_data["fitness"]
+            if self.metrics:
+                self.metrics.record_step(alive_count)
 
-            self._render_all_entities(entities_data, step, alive_count)
+            if visual:
+                self._publish_frame(entities, step, alive_count)
 
             if alive_count == 0:
                 print(f"All entities died at step {step}")
                 break
 
             step += 1
-            self.clock.tick(60)
+            if visual and self.simulation_speed:
+                next_step_at += 1 / (self.STEPS_PER_SECOND * self.simulation_speed)
+                delay = next_step_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_step_at = time.perf_counter()
+
+        descriptors = None
+        if self.novelty is not None:
+            descriptors = [
+                entity.trajectory.descriptor(self.world, entity.checkpoints_passed)
+                for entity in entities
+            ]
+        self._assign_fitness(
+            [entity.genome for entity in entities],
+            [entity.fitness for entity in entities],
+            descriptors,
+        )
 
-        for entity_data in entities_data:
-            entity_data["genome"].fitness = entity_data["fitness"]
-            print(
-                f"Genome {entity_data['genome_id']}: Fitness = {entity_data['fitness']:.2f}"
+        if self.metrics:
+            self.metrics.end_generation(
+                (entity.fitness for entity in entities),
+                sum(entity.checkpoints_passed for entity in entities),
             )
 
-    def _render_all_entities(self, entities_data, step, alive_count):
+    def _assign_fitness(self, genomes, rewards, descriptors):
+        """
+        Set each genome's NEAT fitness to its reward, or with novelty search to
+        the novelty of its behaviour descriptor. Novelty runs also keep a copy of
+        the genome with the best reward so far as the champion run returns.
+        """
+        if self.novelty is None:
+            for genome, reward in zip(genomes, rewards):
+                genome.fitness = reward
+            return
+
+        scores = self.novelty.evaluate(descriptors)
+        for genome, reward, score in zip(genomes, rewards, scores):
+            genome.fitness = float(score)
+            if self.champion is None or reward > self.champion.fitness:
+                self.champion = copy.deepcopy(genome)
+                self.champion.fitness = reward
+
+    def _handle_commands(self):
+        """
+        Apply commands sent by the UI thread. Blocks from a pause until the
+        matching resume, and raises SimulationStopped on quit so evolution ends
+        between steps.
         """
-        Render all entities.
+        paused = False
+        while True:
+            try:
+                command, value = self.commands.get(block=paused)
+            except queue.Empty:
+                return
+            if command == "quit":
+                raise SimulationStopped()
+            if command == "pause":
+                paused = value
+            elif command == "speed":
+                self.simulation_speed = value
+
+    def _publish_frame(self, entities, step, alive_count):
         """
-        self.screen.fill((0, 0, 0))
-        self.world.draw(self.screen)
+        Queue a snapshot of this step for the UI thread. When the UI falls
+        behind the oldest frame is dropped, so rendering never slows the
+        simulation down.
+        """
+        alive = [entity for entity in entities if entity.env.is_alive()]
+        leader = max(alive or entities, key=lambda entity: entity.fitness)
+        frame = Frame(
+            self.generation,
+            step,
+            alive_count,
+            leader.fitness,
+            leader.position,
+            [entity.env.snapshot() for entity in entities],
+        )
+        while True:
+            try:
+                self.frames.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self.frames.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _acquire_entities(self, genomes, config):
+        """
+        Fit the entity pool to the population size and reset it in place,
+        so environments and cars are built once rather than every generation.
+        """
+        while len(self.entity_pool) < len(genomes):
+            self.entity_pool.append(
+                Entity(
+                    make_environment(
+                        self.environment_class,
+                        self.world,
+                        self.sensors,
+                        self.max_steps,
+                    ),
+                    self._make_trajectory(),
+                )
+            )
+        del self.entity_pool[len(genomes) :]
+
+        for entity, (_, genome) in zip(self.entity_pool, genomes):
+            entity.genome = genome
+            entity.net = neat.nn.FeedForwardNetwork.create(genome, config)
+            entity.fitness = 0
+            entity.checkpoints_passed = 0
+            entity.steps = 0
+            entity.done = False
+            entity.position = self.world.start_position
+            entity.env.reset()
+            if entity.trajectory is not None:
+                entity.trajectory.reset()
+        return self.entity_pool
+
+    def _make_trajectory(self):
+        """Trajectory recorder for one episode, or None without novelty search."""
+        if self.novelty is None:
+            return None
+        return self.novelty.trajectory(self.max_steps)
+
+    def _eval_genomes_headless(self, genomes, config):
+        """
+        Evaluate genomes one episode at a time, in worker processes if configured.
+        Without traffic entities never interact, so this matches stepping them
+        together.
+        """
+        if self.metrics:
+            self.metrics.start_generation(self.generation, len(genomes))
 
-        for entity_data in entities_data:
-            entity_data["env"].render_entity(self.screen)
+        if self.halving_min_steps:
+            self._eval_genomes_halving(genomes, config)
+            return
 
-        gen_text = self.font.render(
-            f"Generation: {self.generation}", True, (255, 255, 255)
+        if self.pool is not None:
+            results = self.pool.map(
+                _evaluate_in_worker, [(genome, config) for _, genome in genomes]
+            )
+        else:
+            if self.headless_env is None:
+                self.headless_env = make_environment(
+                    self.environment_class, self.world, self.sensors, self.max_steps
+                )
+                self.headless_trajectory = self._make_trajectory()
+            results = [
+                evaluate_behavior(
+                    genome,
+                    config,
+                    self.world,
+                    self.environment_class,
+                    self.max_steps,
+                    self.headless_env,
+                    self.headless_trajectory,
+                )
+                for _, genome in genomes
+            ]
+
+        self._assign_fitness(
+            [genome for _, genome in genomes],
+            [fitness for fitness, _, _, _ in results],
+            [descriptor for _, _, _, descriptor in results],
         )
-        self.screen.blit(gen_text, (10, 10))
 
-        alive_text = self.font.render(
-            f"Alive: {alive_count}/{len(entities_data)}", True, (255, 255, 255)
-        )
-        self.screen.blit(alive_text, (10, 50))
+        if self.metrics:
+            self.metrics.record_episodes(steps for _, steps, _, _ in results)
+            self.metrics.end_generation(
+                (fitness for fitness, _, _, _ in results),
+                sum(checkpoints for _, _, checkpoints, _ in results),
+            )
 
-        step_text = self.font.render(
-            f"Step: {step}/{self.max_steps}", True, (255, 255, 255)
-        )
-        self.screen.blit(step_text, (10, 90))
+    def _halving_horizons(self):
+        """Episode lengths for each successive-halving stage, ending at max_steps."""
+        horizons = []
+        horizon = self.halving_min_steps
+        while horizon < self.max_steps:
+            horizons.append(horizon)
+            horizon *= self.halving_eta
+        horizons.append(self.max_steps)
+        return horizons
+
+    def _eval_genomes_halving(self, genomes, config):
+        """
+        Evaluate with successive halving over episode length: every genome runs
+        for the shortest horizon, then only the best 1/eta of those still driving
+        continue to the next, up to max_steps.
+
+        Genomes that die on their own keep their exact fitness. A genome cut off
+        at a stage keeps the fitness it had earned, capped just below every genome
+        promoted from that stage, so NEAT ranks them the way the scheduler did.
+        Runs in this process, so it is not combined with worker processes.
+        """
+        entities = self._acquire_entities(genomes, config)
+        running = list(entities)
+        stages = []
+
+        for horizon in self._halving_horizons():
+            for entity in running:
+                entity.advance(horizon)
+            running = [entity for entity in running if not entity.done]
+            if horizon >= self.max_steps or not running:
+                break
+
+            running.sort(key=lambda entity: entity.fitness, reverse=True)
+            keep = math.ceil(len(running) / self.halving_eta)
+            stages.append((running[:keep], running[keep:]))
+            running = running[:keep]
+
+        for promoted, stopped in reversed(stages):
+            floor = min(entity.fitness for entity in promoted)
+            for entity in stopped:
+                entity.fitness = min(entity.fitness, floor - 1)
+
+        for entity in entities:
+            entity.genome.fitness = entity.fitness
+
+        if self.metrics:
+            self.metrics.record_episodes(entity.steps for entity in entities)
+            self.metrics.end_generation(
+                (entity.fitness for entity in entities),
+                sum(entity.checkpoints_passed for entity in entities),
+            )
+
+    def _render_frame(self, frame):
+        """
+        Render a frame published by the simulation thread.
+        When the world fits on screen the track is composited once per generation,
+        and after that only the areas cars and HUD text covered last frame and this
+        frame are redrawn. Larger worlds are drawn through a camera that follows
+        the leading entity.
+        """
+        import pygame
+
+        if frame.generation != self.rendered_generation:
+            self.dirty_rects = None
+            self.rendered_generation = frame.generation
+
+        screen_width, screen_height = self.screen.get_size()
+        if self.world.width > screen_width or self.world.height > screen_height:
+            offset = self.world.camera_offset(frame.leader, self.screen.get_size())
+            self.screen.fill((0, 0, 0))
+            self.world.draw(self.screen, offset)
+            self.dirty_rects = None
+        else:
+            offset = (0, 0)
+            if self.background is None:
+                self.background = pygame.Surface(self.screen.get_size())
+                self.background.fill((0, 0, 0))
+                self.world.draw(self.background)
+
+            if self.dirty_rects is None:
+                self.screen.blit(self.background, (0, 0))
+            else:
+                for rect in self.dirty_rects:
+                    self.screen.blit(self.background, rect, rect)
+
+        full_redraw = self.dirty_rects is None
+        drawn_rects = [
+            self.environment_class.render_snapshot(self.screen, snapshot, offset)
+            for snapshot in frame.entities
+        ]
+
+        if self.paused:
+            status = "Paused"
+        elif self.speed:
+            status = f"Speed: {self.speed}x"
+        else:
+            status = "Speed: max"
+        hud_lines = [
+            f"Generation: {frame.generation}",
+            f"Alive: {frame.alive}/{len(frame.entities)}",
+            f"Step: {frame.step}/{self.max_steps}",
+            f"Best Fitness: {frame.best_fitness:.2f}",
+            status,
+        ]
+        for i, line in enumerate(hud_lines):
+            drawn_rects.append(self.glyphs.render(self.screen, line, (10, 10 + i * 40)))
+
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.dirty_rects + drawn_rects)
+        self.dirty_rects = drawn_rects
+
+    def _handle_events(self):
+        """
+        Turn window events into simulation commands: space pauses, up and down
+        change speed, escape or closing the window quits.
 
-        if entities_data:
-            best_fitness = max(car["fitness"] for car in entities_data)
-            fitness_text = self.font.render(
-                f"Best Fitness: {best_fitness:.2f}", True, (255, 255, 255)
+        Returns:
+            bool: whether the pause state or speed shown in the HUD changed.
+        """
+        import pygame
+
+        changed = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (
+                event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE
+            ):
+                self.commands.put(("quit", None))
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                self.paused = not self.paused
+                self.commands.put(("pause", self.paused))
+                changed = True
+            elif event.type == pygame.KEYDOWN and event.key in (
+                pygame.K_UP,
+                pygame.K_DOWN,
+            ):
+                index = self.SPEEDS.index(self.speed)
+                step = 1 if event.key == pygame.K_UP else -1
+                self.speed = self.SPEEDS[
+                    min(max(index + step, 0), len(self.SPEEDS) - 1)
+                ]
+                self.commands.put(("speed", self.speed))
+                changed = True
+        return changed
+
+    def _run_visual(self, population, generations):
+        """
+        Evolve in a simulation thread while this thread handles the window,
+        rendering the latest published frame at most 60 times a second, and
+        redrawing the last one when the HUD changes while none arrive.
+        Quitting stops evolution between steps and returns the best genome of
+        the generations that finished.
+        """
+        if self.world is None:
+            screen_width, screen_height = self.screen.get_size()
+            self.world = self.world_class(
+                screen_width, screen_height, self.start, self.checkpoints
             )
-            self.screen.blit(fitness_text, (10, 130))
 
-        pygame.display.flip()
+        result = {}
+
+        def evolve():
+            try:
+                result["winner"] = population.run(self.eval_genomes, n=generations)
+            except SimulationStopped:
+                print("Simulation stopped by user")
+                result["winner"] = population.best_genome
+            except Exception as e:
+                result["error"] = e
 
-    def run(self):
+        thread = threading.Thread(target=evolve, name="neat-simulation", daemon=True)
+        thread.start()
+        last_frame = None
+        try:
+            while thread.is_alive():
+                hud_changed = self._handle_events()
+
+                frame = None
+                while True:
+                    try:
+                        frame = self.frames.get_nowait()
+                    except queue.Empty:
+                        break
+                if frame is None and hud_changed:
+                    frame = last_frame
+                if frame is not None:
+                    self._render_frame(frame)
+                    last_frame = frame
+
+                self.clock.tick(60)
+        finally:
+            if thread.is_alive():
+                self.commands.put(("quit", None))
+                thread.join()
+
+        if "error" in result:
+            raise result["error"]
+        return result.get("winner")
+
+    def run(self, generations=50):
         """
-        Run the NEAT evolution.
+        Run the NEAT evolution and return the best genome found.
         """
+        if self.screen is None and self.traffic is None and self.workers > 1:
+            import multiprocessing
+
+            self.pool = multiprocessing.Pool(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(
+                    self.world,
+                    self.environment_class,
+                    self.max_steps,
+                    self.sensors,
+                    self._make_trajectory(),
+                ),
+            )
+
+        winner = None
         try:
-            config = neat.Config(
-                neat.DefaultGenome,
-                neat.DefaultReproduction,
-                neat.DefaultSpeciesSet,
-                neat.DefaultStagnation,
-                self.config_path,
+            config = load_config(
+                self.config_path, self.environment_class.num_inputs(self.sensors)
             )
 
             population = neat.Population(config)
             population.add_reporter(neat.StdOutReporter(True))
-            population.run(self.eval_genomes, n=50)
+            if self.screen is None:
+                winner = population.run(self.eval_genomes, n=generations)
+            else:
+                winner = self._run_visual(population, generations)
+            if self.champion is not None:
+                winner = self.champion
 
         except KeyboardInterrupt:
             print("Simulation stopped by user")
         except Exception as e:
             print(f"Error during simulation: {e}")
         finally:
-            pygame.quit()
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+                self.pool = None
+            if self.metrics:
+                self.metrics.close()
+            if self.screen is not None:
+                import pygame
+
+                pygame.quit()
+
+        return winner
 
 
 def main():
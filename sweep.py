@@ -0,0 +1,300 @@
+import configparser
+import csv
+import itertools
+import math
+import multiprocessing
+import os
+import pickle
+import random
+import tempfile
+import time
+
+import neat
+
+import simulation
+from race_environment import RaceEnvironment
+
+
+GAME_CONFIG_KEYS = ("max_steps",)
+
+
+def parse_param(spec):
+    """
+    Parse a "key=values" sweep parameter.
+
+    "pop_size=20,50" gives a list of choices, "weight_mutate_rate=0.5:0.9"
+    gives a (low, high) range that is only valid for random search.
+    """
+    key, _, values = spec.partition("=")
+    if not values:
+        raise ValueError(f"Sweep parameter must look like key=values: {spec}")
+    if ":" in values:
+        low, high = values.split(":")
+        return key.strip(), (_parse_value(low), _parse_value(high))
+    return key.strip(), [_parse_value(value) for value in values.split(",")]
+
+
+def _parse_value(text):
+    text = text.strip()
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def grid_trials(params):
+    """Expand every combination of the parameter choices."""
+    for key, values in params.items():
+        if isinstance(values, tuple):
+            raise ValueError(f"Ranges need random search: {key}")
+
+    keys = list(params)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*params.values())]
+
+
+def random_trials(params, samples, rng):
+    """Draw samples trials, uniform over ranges and choices."""
+    trials = []
+    for _ in range(samples):
+        trial = {}
+        for key, values in params.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    trial[key] = rng.randint(low, high)
+                else:
+                    trial[key] = rng.uniform(low, high)
+            else:
+                trial[key] = rng.choice(values)
+        trials.append(trial)
+    return trials
+
+
+def write_config(base_path, overrides, path):
+    """Copy a NEAT config file, replacing the values of the given keys."""
+    parser = configparser.ConfigParser()
+    parser.read(base_path)
+
+    for key, value in overrides.items():
+        sections = [section for section in parser.sections() if key in parser[section]]
+        if not sections:
+            raise KeyError(f"Unknown NEAT config key: {key}")
+        for section in sections:
+            parser[section][key] = str(value)
+
+    with open(path, "w") as file:
+        parser.write(file)
+
+
+def _run_trial(config_path, max_steps, seed, generations, state):
+    """
+    Continue one trial for the given number of generations inside a worker.
+    The best genome is scored over the worker's max_steps, so trials that
+    sweep max_steps are ranked on the same episode length.
+
+    Returns:
+        tuple: (best_fitness, generations_run, seconds, state)
+    """
+    world, environment_class, worker_max_steps = simulation._worker_context
+    env = simulation._worker_env
+    if max_steps != worker_max_steps:
+        env = simulation.make_environment(
+            environment_class, world, env.car.sensors, max_steps
+        )
+    config = simulation.load_config(
+        config_path, environment_class.num_inputs(env.car.sensors)
+    )
+
+    if state is None:
+        random.seed(seed)
+        population = neat.Population(config)
+    else:
+        population, rng_state = pickle.loads(state)
+        random.setstate(rng_state)
+
+    def eval_genomes(genomes, config):
+        for _, genome in genomes:
+            genome.fitness = simulation.evaluate_genome(
+                genome,
+                config,
+                world,
+                environment_class,
+                max_steps,
+                env=env,
+            )[0]
+
+    start_generation = population.generation
+    start = time.perf_counter()
+    try:
+        population.run(eval_genomes, n=generations)
+    except neat.CompleteExtinctionException:
+        pass
+    elapsed = time.perf_counter() - start
+
+    best = -math.inf
+    if population.best_genome is not None:
+        best = population.best_genome.fitness
+        if max_steps != worker_max_steps:
+            best = simulation.evaluate_genome(
+                population.best_genome,
+                config,
+                world,
+                environment_class,
+                worker_max_steps,
+                env=simulation._worker_env,
+            )[0]
+    generations_run = population.generation - start_generation
+    return best, generations_run, elapsed, pickle.dumps((population, random.getstate()))
+
+
+class SweepRunner:
+    """
+    Runs NEAT trials concurrently and prunes losers with successive halving:
+    every rung runs the surviving trials to a larger generation budget and
+    keeps the best 1/eta of them. Trials are ranked on their best genome's
+    fitness over max_steps, whatever max_steps they train with.
+    """
+
+    def __init__(
+        self,
+        track,
+        base_config_path,
+        trials,
+        workers=1,
+        min_generations=2,
+        max_generations=16,
+        eta=2,
+        max_steps=1200,
+        seed=0,
+        sensors=None,
+    ):
+        if eta < 2:
+            raise ValueError("eta must be at least 2")
+        if min_generations < 1:
+            raise ValueError("min_generations must be at least 1")
+        self.track = track
+        self.base_config_path = base_config_path
+        self.trials = trials
+        self.workers = workers
+        self.min_generations = min_generations
+        self.max_generations = max_generations
+        self.eta = eta
+        self.max_steps = max_steps
+        self.seed = seed
+        self.sensors = sensors
+
+    def _budgets(self):
+        """Generation budget at each rung, ending at max_generations."""
+        budgets = []
+        budget = self.min_generations
+        while budget < self.max_generations:
+            budgets.append(budget)
+            budget *= self.eta
+        budgets.append(self.max_generations)
+        return budgets
+
+    def run(self):
+        """Run the sweep and return one result dict per trial, best first."""
+        with tempfile.TemporaryDirectory() as config_dir:
+            results = []
+            for trial_id, params in enumerate(self.trials):
+                neat_params = {
+                    key: value
+                    for key, value in params.items()
+                    if key not in GAME_CONFIG_KEYS
+                }
+                config_path = os.path.join(config_dir, f"trial-{trial_id}.txt")
+                write_config(self.base_config_path, neat_params, config_path)
+                results.append(
+                    {
+                        "trial": trial_id,
+                        "params": params,
+                        "config_path": config_path,
+                        "max_steps": params.get("max_steps", self.max_steps),
+                        "generations": 0,
+                        "best_fitness": -math.inf,
+                        "wall_seconds": 0.0,
+                        "status": "running",
+                        "state": None,
+                    }
+                )
+
+            with multiprocessing.Pool(
+                self.workers,
+                initializer=simulation._init_worker,
+                initargs=(
+                    self.track,
+                    RaceEnvironment,
+                    self.max_steps,
+                    self.sensors,
+                ),
+            ) as pool:
+                self._run_rungs(pool, results)
+
+        for result in results:
+            del result["config_path"], result["state"]
+        results.sort(key=lambda result: result["best_fitness"], reverse=True)
+        return results
+
+    def _run_rungs(self, pool, results):
+        survivors = list(results)
+        budgets = self._budgets()
+
+        for rung, budget in enumerate(budgets):
+            jobs = [
+                (
+                    result["config_path"],
+                    result["max_steps"],
+                    self.seed + result["trial"],
+                    budget - result["generations"],
+                    result["state"],
+                )
+                for result in survivors
+            ]
+            for result, (best, generations, seconds, state) in zip(
+                survivors, pool.starmap(_run_trial, jobs)
+            ):
+                result["best_fitness"] = max(result["best_fitness"], best)
+                result["generations"] += generations
+                result["wall_seconds"] += seconds
+                result["state"] = state
+
+            print(
+                f"Rung {rung}: {len(survivors)} trials at {budget} generations, "
+                f"best fitness {max(r['best_fitness'] for r in survivors):.2f}"
+            )
+
+            if rung == len(budgets) - 1:
+                for result in survivors:
+                    result["status"] = "completed"
+                break
+
+            survivors.sort(key=lambda result: result["best_fitness"], reverse=True)
+            keep = max(1, math.ceil(len(survivors) / self.eta))
+            for result in survivors[keep:]:
+                result["status"] = f"stopped at rung {rung}"
+                result["state"] = None
+            survivors = survivors[:keep]
+
+
+def write_results(results, path):
+    """Write the sweep results table as CSV."""
+    keys = sorted({key for result in results for key in result["params"]})
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(
+            ["trial", *keys, "generations", "best_fitness", "wall_seconds", "status"]
+        )
+        for result in results:
+            writer.writerow(
+                [
+                    result["trial"],
+                    *(result["params"].get(key, "") for key in keys),
+                    result["generations"],
+                    f"{result['best_fitness']:.2f}",
+                    f"{result['wall_seconds']:.2f}",
+                    result["status"],
+                ]
+            )
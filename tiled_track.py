@@ -0,0 +1,227 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from track import TRACK_COLOR, Track
+from track_generator import GRID_SIZE, rasterize_grid
+
+
+MASK_FILE = "mask.npy"
+META_FILE = "map.json"
+
+
+class TiledMask:
+    """
+    A drivable mask stored tile-major and bit-packed in a memory-mapped .npy file.
+
+    Indexing with mask[y, x] looks the pixel up in its tile; tiles are copied
+    out of the file on first use and kept in an LRU of at most max_resident.
+    The simulation and the window thread both read tiles, so a lock guards it.
+    """
+
+    def __init__(self, path, width, height, tile_size, max_resident=64):
+        self.path = path
+        self.shape = (height, width)
+        self.tile_size = tile_size
+        self.max_resident = max_resident
+        self._tiles = None
+        self._resident = OrderedDict()
+        self._last_key = None
+        self._last_tile = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        """Pickle only the file location; each process maps the file itself."""
+        state = self.__dict__.copy()
+        state.update(_tiles=None, _resident=OrderedDict(), _last_key=None, _last_tile=None)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def tile(self, tile_y, tile_x):
+        """Return one tile as an in-memory array, loading it if needed."""
+        with self._lock:
+            return self._tile(tile_y, tile_x)
+
+    def _tile(self, tile_y, tile_x):
+        key = (tile_y, tile_x)
+        if key == self._last_key:
+            return self._last_tile
+
+        tile = self._resident.get(key)
+        if tile is None:
+            if self._tiles is None:
+                self._tiles = np.load(self.path, mmap_mode="r")
+            tile = np.unpackbits(
+                self._tiles[tile_y, tile_x], axis=-1, count=self.tile_size
+            ).astype(bool)
+            self._resident[key] = tile
+            if len(self._resident) > self.max_resident:
+                self._resident.popitem(last=False)
+        else:
+            self._resident.move_to_end(key)
+
+        self._last_key, self._last_tile = key, tile
+        return tile
+
+    def __getitem__(self, index):
+        y, x = index
+        size = self.tile_size
+        if np.ndim(y) == 0:
+            return self.tile(y // size, x // size)[y % size, x % size]
+
+        # Array lookup: gather each touched tile once
+        y, x = np.asarray(y), np.asarray(x)
+        tile_ys, tile_xs = y // size, x // size
+        values = np.zeros(y.shape, dtype=bool)
+        for tile_y, tile_x in set(
+            zip(tile_ys.ravel().tolist(), tile_xs.ravel().tolist())
+        ):
+            in_tile = (tile_ys == tile_y) & (tile_xs == tile_x)
+            values[in_tile] = self.tile(tile_y, tile_x)[
+                y[in_tile] % size, x[in_tile] % size
+            ]
+        return values
+
+
+class TiledTrack(Track):
+    """
+    Track backed by a TiledMask, for maps much larger than the screen.
+    Drawing takes a camera offset and only renders the tiles in view.
+    """
+
+    def __init__(self, width, height, start, checkpoints, mask):
+        super().__init__(width, height, start, checkpoints, mask=mask)
+        self._tile_surfaces = OrderedDict()
+        self._labels = None
+
+    @classmethod
+    def open(cls, path, max_resident=64):
+        """Open a tiled map directory written by save_tiled_map"""
+        with open(os.path.join(path, META_FILE)) as file:
+            meta = json.load(file)
+        mask = TiledMask(
+            os.path.join(path, MASK_FILE),
+            meta["width"],
+            meta["height"],
+            meta["tile_size"],
+            max_resident,
+        )
+        checkpoints = [tuple(checkpoint) for checkpoint in meta["checkpoints"]]
+        return cls(
+            meta["width"], meta["height"], tuple(meta["start"]), checkpoints, mask
+        )
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_tile_surfaces=OrderedDict(), _labels=None)
+        return state
+
+    def get_walls(self):
+        """Tracing walls would read the whole map, so sensors sample the mask instead"""
+        return None
+
+    def _tile_surface(self, tile_y, tile_x):
+        """Render a tile once and keep it alongside the resident mask tiles."""
+        import pygame
+
+        key = (tile_y, tile_x)
+        surface = self._tile_surfaces.get(key)
+        if surface is None:
+            tile = self.mask.tile(tile_y, tile_x)
+            pixels = np.empty(tile.T.shape + (3,), dtype=np.uint8)
+            pixels[:] = self.background_color
+            pixels[tile.T] = TRACK_COLOR
+            surface = pygame.surfarray.make_surface(pixels)
+            self._tile_surfaces[key] = surface
+            if len(self._tile_surfaces) > self.mask.max_resident:
+                self._tile_surfaces.popitem(last=False)
+        else:
+            self._tile_surfaces.move_to_end(key)
+        return surface
+
+    def draw(self, surface, offset=(0, 0)):
+        """Draw the part of the track visible through a camera at offset"""
+        import pygame
+
+        if self._labels is None:
+            font = pygame.font.Font(None, 24)
+            self._labels = [
+                font.render(str(i + 1), True, (255, 215, 0))
+                for i in range(len(self.checkpoints))
+            ]
+
+        size = self.mask.tile_size
+        offset_x, offset_y = int(offset[0]), int(offset[1])
+        view_width, view_height = surface.get_size()
+        tiles_y = -(-self.height // size)
+        tiles_x = -(-self.width // size)
+
+        first_y, first_x = max(offset_y // size, 0), max(offset_x // size, 0)
+        last_y = min((offset_y + view_height) // size, tiles_y - 1)
+        last_x = min((offset_x + view_width) // size, tiles_x - 1)
+        for tile_y in range(first_y, last_y + 1):
+            for tile_x in range(first_x, last_x + 1):
+                surface.blit(
+                    self._tile_surface(tile_y, tile_x),
+                    (tile_x * size - offset_x, tile_y * size - offset_y),
+                )
+
+        for label, (x, y) in zip(self._labels, self.checkpoints):
+            x, y = x - offset_x, y - offset_y
+            pygame.draw.circle(surface, (255, 215, 0), (x, y), self.checkpoint_radius, 3)
+            surface.blit(label, (x - 10, y - 10))
+
+
+def save_tiled_map(path, grid, start, checkpoints, grid_size=GRID_SIZE, tile_size=500):
+    """
+    Rasterize a (rows, cols) track grid into a tiled map directory, one tile at
+    a time, so the full-resolution mask never has to fit in memory.
+    start and checkpoints are pixel positions.
+    """
+    if tile_size % grid_size:
+        raise ValueError("tile_size must be a multiple of grid_size")
+
+    rows, cols = grid.shape
+    height, width = rows * grid_size, cols * grid_size
+    tiles_y, tiles_x = -(-height // tile_size), -(-width // tile_size)
+    cells = tile_size // grid_size
+
+    os.makedirs(path, exist_ok=True)
+    tiles = np.lib.format.open_memmap(
+        os.path.join(path, MASK_FILE),
+        mode="w+",
+        dtype=np.uint8,
+        shape=(tiles_y, tiles_x, tile_size, -(-tile_size // 8)),
+    )
+
+    # One cell of halo around each tile so corner smoothing sees its neighbours
+    padded = np.pad(grid, ((1, cells + 1), (1, cells + 1)))
+    for tile_y in range(tiles_y):
+        for tile_x in range(tiles_x):
+            row, col = tile_y * cells, tile_x * cells
+            block = padded[row : row + cells + 2, col : col + cells + 2]
+            mask = rasterize_grid(block, grid_size)
+            tiles[tile_y, tile_x] = np.packbits(
+                mask[grid_size:-grid_size, grid_size:-grid_size], axis=-1
+            )
+    tiles.flush()
+    del tiles
+
+    with open(os.path.join(path, META_FILE), "w") as file:
+        json.dump(
+            {
+                "width": width,
+                "height": height,
+                "tile_size": tile_size,
+                "start": list(start),
+                "checkpoints": [list(checkpoint) for checkpoint in checkpoints],
+            },
+            file,
+        )
@@ -1,32 +1,112 @@
-import pygame
-import math
+import numpy as np
+
+from walls import WallIndex
+
+
+BACKGROUND_COLOR = (55, 125, 34)
+TRACK_COLOR = (128, 128, 128)
+
+# Size of the map editor's canvas and of one cell of its grid
+MAP_WIDTH = 1200
+MAP_HEIGHT = 800
+GRID_SIZE = 25
+
+# (row offset 1, col offset 1, row offset 2, col offset 2, triangle in cell units):
+# an off-track cell whose two given neighbours are track gets the triangle filled.
+CORNER_CONFIGS = [
+    (-1, 0, 0, -1, [(0, 0), (1, 0), (0, 1)]),  # Top-left L
+    (-1, 0, 0, 1, [(1, 0), (0, 0), (1, 1)]),  # Top-right L
+    (1, 0, 0, -1, [(0, 1), (0, 0), (1, 1)]),  # Bottom-left L
+    (1, 0, 0, 1, [(1, 1), (0, 1), (1, 0)]),  # Bottom-right L
+]
 
 
 class Track:
-    def __init__(self, width, height, start, checkpoints):
-        self.track_image = pygame.image.load("track.png").convert()
-        self.track_image = pygame.transform.scale(self.track_image, (width, height))
-        self.track_surface = self.track_image.copy()
+    def __init__(self, width, height, start, checkpoints, mask=None):
         self.width = width
         self.height = height
 
-        self.background_color = (55, 125, 34)
+        self.background_color = BACKGROUND_COLOR
         self.start_position = start
         self.start_angle = 0
         self.checkpoints = checkpoints
         self.checkpoint_radius = 50
 
-    def draw(self, surface):
-        """Draw the track surface"""
-        surface.blit(self.track_surface, (0, 0))
+        self.track_surface = None
+        self.static_layer = None
+        self.walls = None
+        if mask is None:
+            import pygame
+
+            self.track_image = pygame.image.load("track.png").convert()
+            self.track_image = pygame.transform.scale(self.track_image, (width, height))
+            self.track_surface = self.track_image.copy()
+            mask = surface_to_mask(self.track_surface, self.background_color)
+        self.mask = mask
+
+    @classmethod
+    def from_map_file(cls, path):
+        """Load a track saved with save_map without touching pygame"""
+        mask, start, checkpoints = load_map(path)
+        height, width = mask.shape
+        return cls(width, height, start, checkpoints, mask=mask)
+
+    def get_walls(self):
+        """Return the wall segments of the track, traced from the mask on first use"""
+        if self.walls is None:
+            self.walls = WallIndex.from_mask(self.mask)
+        return self.walls
+
+    def crosses_wall(self, start, end):
+        """Check if moving in a straight line from start to end passes through a wall"""
+        walls = self.get_walls()
+        return walls is not None and walls.crosses(start, end)
+
+    def _get_surface(self):
+        """Return the track surface, building it from the mask if needed"""
+        if self.track_surface is None:
+            import pygame
+
+            pixels = np.empty((self.width, self.height, 3), dtype=np.uint8)
+            pixels[:] = self.background_color
+            pixels[self.mask.T] = TRACK_COLOR
+            self.track_surface = pygame.surfarray.make_surface(pixels)
+        return self.track_surface
+
+    def _get_static_layer(self):
+        """Return the track with its checkpoints drawn, composited once"""
+        if self.static_layer is None:
+            import pygame
 
-        for i, checkpoint_pos in enumerate(self.checkpoints):
-            pygame.draw.circle(
-                surface, (255, 215, 0), checkpoint_pos, self.checkpoint_radius, 3
-            )
+            self.static_layer = self._get_surface().copy()
             font = pygame.font.Font(None, 24)
-            text = font.render(str(i + 1), True, (255, 215, 0))
-            surface.blit(text, (checkpoint_pos[0] - 10, checkpoint_pos[1] - 10))
+            for i, checkpoint_pos in enumerate(self.checkpoints):
+                pygame.draw.circle(
+                    self.static_layer,
+                    (255, 215, 0),
+                    checkpoint_pos,
+                    self.checkpoint_radius,
+                    3,
+                )
+                text = font.render(str(i + 1), True, (255, 215, 0))
+                self.static_layer.blit(
+                    text, (checkpoint_pos[0] - 10, checkpoint_pos[1] - 10)
+                )
+        return self.static_layer
+
+    def camera_offset(self, position, view_size):
+        """Top-left of a view_size camera centred on position, kept inside the track"""
+        view_width, view_height = view_size
+        x = int(position[0]) - view_width // 2
+        y = int(position[1]) - view_height // 2
+        return (
+            min(max(x, 0), max(self.width - view_width, 0)),
+            min(max(y, 0), max(self.height - view_height, 0)),
+        )
+
+    def draw(self, surface, offset=(0, 0)):
+        """Draw the track surface with its checkpoints, seen from a camera at offset"""
+        surface.blit(self._get_static_layer(), (-offset[0], -offset[1]))
 
     def is_on_track(self, position):
         """Check if car has crashed returns False if crashed"""
@@ -35,10 +115,17 @@ class Track:
         if x < 0 or x >= self.width or y < 0 or y >= self.height:
             return False
 
-        pixel_color = self.track_surface.get_at((x, y))[:3]
-        if pixel_color == self.background_color:
-            return False
-        return True
+        return bool(self.mask[y, x])
+
+    def are_on_track(self, xs, ys):
+        """Vectorized is_on_track for arrays of x and y coordinates"""
+        xs = np.asarray(xs).astype(np.intp)
+        ys = np.asarray(ys).astype(np.intp)
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+
+        on_track = np.zeros(xs.shape, dtype=bool)
+        on_track[inside] = self.mask[ys[inside], xs[inside]]
+        return on_track
 
     def check_checkpoint_collision(self, car_position, current_checkpoint_index):
         """Check if car has reached the next checkpoint"""
@@ -56,3 +143,30 @@ class Track:
             return True, next_checkpoint
 
         return False, current_checkpoint_index
+
+
+def surface_to_mask(surface, background_color=BACKGROUND_COLOR):
+    """Convert a track surface to a (height, width) boolean drivable mask"""
+    import pygame
+
+    pixels = pygame.surfarray.array3d(surface).transpose(1, 0, 2)
+    return np.any(pixels != np.array(background_color, dtype=pixels.dtype), axis=2)
+
+
+def save_map(path, surface, start, checkpoints):
+    """Save a track surface with its start position and checkpoints"""
+    np.savez_compressed(
+        path,
+        mask=surface_to_mask(surface),
+        start=np.array(start, dtype=np.int32),
+        checkpoints=np.array(checkpoints, dtype=np.int32).reshape(-1, 2),
+    )
+
+
+def load_map(path):
+    """Load (mask, start, checkpoints) from a file written by save_map"""
+    with np.load(path) as data:
+        mask = data["mask"].astype(bool)
+        start = tuple(int(v) for v in data["start"])
+        checkpoints = [tuple(int(v) for v in cp) for cp in data["checkpoints"]]
+    return mask, start, checkpoints
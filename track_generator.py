@@ -0,0 +1,306 @@
+import numpy as np
+
+from track import CORNER_CONFIGS, GRID_SIZE, MAP_HEIGHT, MAP_WIDTH, Track
+
+
+ROWS = MAP_HEIGHT // GRID_SIZE
+COLS = MAP_WIDTH // GRID_SIZE
+
+NEIGHBOURS_4 = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+NEIGHBOURS_8 = NEIGHBOURS_4 + [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+def _shift(grids, dr, dc):
+    """Return grids[..., r + dr, c + dc], with False outside the grid."""
+    rows, cols = grids.shape[-2:]
+    shifted = np.zeros_like(grids)
+    shifted[
+        ..., max(-dr, 0) : rows - max(dr, 0), max(-dc, 0) : cols - max(dc, 0)
+    ] = grids[..., max(dr, 0) : rows + min(dr, 0), max(dc, 0) : cols + min(dc, 0)]
+    return shifted
+
+
+def _triangle_mask(offsets, size):
+    """
+    Pixels pygame.draw.polygon fills for the triangle in a size x size cell.
+    Its edges are included, so the mask is (size + 1, size + 1) and overhangs
+    the cell by one pixel to the right and below.
+    """
+    pixels = np.arange(size + 1)
+    x, y = np.meshgrid(pixels, pixels)
+    (x1, y1), (x2, y2), (x3, y3) = (
+        (ox * size, oy * size) for ox, oy in offsets
+    )
+
+    def side(ax, ay, bx, by):
+        return (x - bx) * (ay - by) - (ax - bx) * (y - by)
+
+    d1 = side(x1, y1, x2, y2)
+    d2 = side(x2, y2, x3, y3)
+    d3 = side(x3, y3, x1, y1)
+    has_negative = (d1 < 0) | (d2 < 0) | (d3 < 0)
+    has_positive = (d1 > 0) | (d2 > 0) | (d3 > 0)
+    return ~(has_negative & has_positive)
+
+
+def rasterize_grid(grid, grid_size=GRID_SIZE):
+    """
+    Turn a (rows, cols) boolean track grid into a pixel drivable mask, applying the
+    same corner smoothing that RaceMapCreator.get_map_data draws.
+    """
+    size = grid_size
+    rows, cols = grid.shape
+    # One spare row and column take the overhang of triangles on the far edges
+    padded = np.zeros((rows * size + 1, cols * size + 1), dtype=bool)
+    padded[:-1, :-1] = np.kron(grid, np.ones((size, size), dtype=bool))
+    for dr1, dc1, dr2, dc2, offsets in CORNER_CONFIGS:
+        corners = ~grid & _shift(grid, dr1, dc1) & _shift(grid, dr2, dc2)
+        if corners.any():
+            triangle = _triangle_mask(offsets, size)
+            body, edge = slice(0, -1), slice(size, None, size)
+            for row_slice, col_slice, part in (
+                (body, body, triangle[:size, :size]),
+                (edge, body, triangle[size:, :size]),
+                (body, edge, triangle[:size, size:]),
+                (edge, edge, triangle[size:, size:]),
+            ):
+                padded[row_slice, col_slice] |= np.kron(corners, part).astype(bool)
+
+    return padded[:-1, :-1]
+
+
+class TrackGenerator:
+    """
+    Generates closed-loop tracks on the RaceMapCreator grid.
+
+    Candidates are built in batches: each is the inner boundary ring of a union
+    of random rectangles on a coarse grid, scaled up so roads are lane_width
+    cells wide. Rings that are not a single simple loop are rejected.
+    """
+
+    def __init__(self, rows=ROWS, cols=COLS, lane_width=3, num_checkpoints=6, seed=None):
+        self.rows = rows
+        self.cols = cols
+        self.lane_width = lane_width
+        self.coarse_rows = rows // lane_width
+        self.coarse_cols = cols // lane_width
+        self.num_checkpoints = num_checkpoints
+        self.rng = np.random.default_rng(seed)
+
+    def _candidate_rings(self, batch_size, max_rectangles=4):
+        """Build a batch of coarse rings and flag the ones that are simple loops."""
+        rows, cols = self.coarse_rows, self.coarse_cols
+        shape = (batch_size, max_rectangles)
+
+        heights = self.rng.integers(3, rows + 1, shape)
+        widths = self.rng.integers(3, cols + 1, shape)
+        tops = self.rng.integers(0, rows - heights + 1)
+        lefts = self.rng.integers(0, cols - widths + 1)
+        counts = self.rng.integers(1, max_rectangles + 1, batch_size)
+        used = np.arange(max_rectangles) < counts[:, None]
+
+        r = np.arange(rows)[None, None, :, None]
+        c = np.arange(cols)[None, None, None, :]
+        inside = (
+            (r >= tops[..., None, None])
+            & (r < (tops + heights)[..., None, None])
+            & (c >= lefts[..., None, None])
+            & (c < (lefts + widths)[..., None, None])
+            & used[..., None, None]
+        )
+        blobs = inside.any(axis=1)
+
+        interior = blobs.copy()
+        for dr, dc in NEIGHBOURS_8:
+            interior &= _shift(blobs, dr, dc)
+        rings = blobs & ~interior
+
+        degree = sum(
+            _shift(rings, dr, dc).astype(np.int8) for dr, dc in NEIGHBOURS_4
+        )
+        valid = ~(rings & (degree != 2)).any(axis=(1, 2))
+
+        for dr, dc in [(1, 1), (1, -1)]:
+            diagonal_only = (
+                rings & _shift(rings, dr, dc) & ~_shift(rings, dr, 0) & ~_shift(rings, 0, dc)
+            )
+            valid &= ~diagonal_only.any(axis=(1, 2))
+
+        valid &= rings.any(axis=(1, 2))
+        return rings, valid
+
+    @staticmethod
+    def _walk_loop(ring):
+        """Return ring cells in loop order, or None if the ring is not one loop."""
+        cells = np.argwhere(ring)
+        start = tuple(cells[0])
+        loop = [start]
+        previous, current = None, start
+
+        while True:
+            row, col = current
+            for dr, dc in NEIGHBOURS_4:
+                neighbour = (row + dr, col + dc)
+                if (
+                    neighbour != previous
+                    and 0 <= neighbour[0] < ring.shape[0]
+                    and 0 <= neighbour[1] < ring.shape[1]
+                    and ring[neighbour]
+                ):
+                    break
+            previous, current = current, neighbour
+            if current == start:
+                break
+            loop.append(current)
+
+        return loop if len(loop) == len(cells) else None
+
+    def _orient_loop(self, loop):
+        """
+        Rotate and orient the loop so it begins on a straight that heads right,
+        matching Track.start_angle = 0. Returns None if there is no such straight.
+        """
+        n = len(loop)
+        for direction in (loop, loop[::-1]):
+            for i in range(n):
+                (r0, c0), (r1, c1), (r2, c2) = (
+                    direction[i - 1],
+                    direction[i],
+                    direction[(i + 1) % n],
+                )
+                if r0 == r1 == r2 and c0 + 1 == c1 == c2 - 1:
+                    return direction[i:] + direction[:i]
+        return None
+
+    def _to_fine(self, coarse_cell):
+        """Centre fine-grid cell of a coarse cell."""
+        offset_row = (self.rows - self.coarse_rows * self.lane_width) // 2
+        offset_col = (self.cols - self.coarse_cols * self.lane_width) // 2
+        row, col = coarse_cell
+        half = self.lane_width // 2
+        return (
+            offset_row + row * self.lane_width + half,
+            offset_col + col * self.lane_width + half,
+        )
+
+    def _to_fine_grid(self, ring):
+        grid = np.zeros((self.rows, self.cols), dtype=bool)
+        offset_row = (self.rows - self.coarse_rows * self.lane_width) // 2
+        offset_col = (self.cols - self.coarse_cols * self.lane_width) // 2
+        scaled = np.kron(ring, np.ones((self.lane_width, self.lane_width), dtype=bool))
+        grid[
+            offset_row : offset_row + scaled.shape[0],
+            offset_col : offset_col + scaled.shape[1],
+        ] = scaled
+        return grid
+
+    def generate(self, count, batch_size=256, max_idle_batches=50):
+        """
+        Generate count distinct tracks. Raises ValueError when max_idle_batches
+        batches in a row add no new track, as small grids only fit a few.
+
+        Returns:
+            tuple: (grids, starts, checkpoints) with grids a (count, rows, cols)
+            bool array and starts/checkpoints in (col, row) grid cells.
+        """
+        grids, starts, checkpoints = [], [], []
+        seen = set()
+        idle_batches = 0
+
+        while len(grids) < count:
+            if idle_batches == max_idle_batches:
+                raise ValueError(
+                    f"Found only {len(grids)} distinct tracks on a "
+                    f"{self.rows}x{self.cols} grid"
+                )
+            found = len(grids)
+            rings, valid = self._candidate_rings(batch_size)
+            for ring in rings[valid]:
+                key = ring.tobytes()
+                if key in seen:
+                    continue
+                loop = self._walk_loop(ring)
+                if loop is None or len(loop) < self.num_checkpoints + 1:
+                    continue
+                loop = self._orient_loop(loop)
+                if loop is None:
+                    continue
+
+                spacing = len(loop) / (self.num_checkpoints + 1)
+                checkpoint_cells = [
+                    loop[round(spacing * (i + 1))] for i in range(self.num_checkpoints)
+                ]
+
+                seen.add(key)
+                grids.append(self._to_fine_grid(ring))
+                start_row, start_col = self._to_fine(loop[0])
+                starts.append((start_col, start_row))
+                checkpoints.append(
+                    [
+                        (col, row)
+                        for row, col in (self._to_fine(cell) for cell in checkpoint_cells)
+                    ]
+                )
+                if len(grids) == count:
+                    break
+            idle_batches = 0 if len(grids) > found else idle_batches + 1
+
+        return (
+            np.array(grids, dtype=bool),
+            np.array(starts, dtype=np.int16),
+            np.array(checkpoints, dtype=np.int16),
+        )
+
+
+class TrackStore:
+    """
+    A bit-packed set of grid tracks in one .npz file.
+    Each track costs rows * cols / 8 bytes plus its start and checkpoint cells.
+    """
+
+    def __init__(self, grids, starts, checkpoints, grid_size=GRID_SIZE):
+        self.grids = grids
+        self.starts = starts
+        self.checkpoints = checkpoints
+        self.grid_size = grid_size
+
+    def __len__(self):
+        return len(self.grids)
+
+    def save(self, path):
+        """Write the store as a compressed, bit-packed .npz"""
+        np.savez_compressed(
+            path,
+            grids=np.packbits(self.grids, axis=-1),
+            shape=np.array(self.grids.shape),
+            starts=self.starts,
+            checkpoints=self.checkpoints,
+            grid_size=self.grid_size,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Read a store written by save"""
+        with np.load(path) as data:
+            shape = tuple(data["shape"])
+            grids = np.unpackbits(data["grids"], axis=-1, count=shape[-1]).astype(bool)
+            return cls(
+                grids.reshape(shape),
+                data["starts"],
+                data["checkpoints"],
+                int(data["grid_size"]),
+            )
+
+    def _cell_centre(self, col, row):
+        return (
+            int(col) * self.grid_size + self.grid_size // 2,
+            int(row) * self.grid_size + self.grid_size // 2,
+        )
+
+    def track(self, index):
+        """Build the Track for one stored entry."""
+        mask = rasterize_grid(self.grids[index], self.grid_size)
+        height, width = mask.shape
+        start = self._cell_centre(*self.starts[index])
+        checkpoints = [self._cell_centre(col, row) for col, row in self.checkpoints[index]]
+        return Track(width, height, start, checkpoints, mask=mask)
@@ -0,0 +1,223 @@
+import math
+
+import numpy as np
+
+
+class SpatialHash:
+    """
+    Uniform grid over a set of grouped points for finding close pairs.
+    Rebuilt from scratch with one sort, so it costs O(n log n) per step. Points
+    are sorted by cell and then by group, so pair queries skip a point's own
+    group without expanding it, however many of its members share the cell.
+    """
+
+    # Cell coordinates are packed into one int64 key; the offset keeps them positive
+    _STRIDE = 1 << 32
+    _OFFSET = 1 << 30
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.positions = np.zeros((0, 2))
+        self.cells = np.zeros((0, 2), dtype=np.int64)
+        self.groups = np.zeros(0, dtype=np.intp)
+        self.group_count = 1
+        self.cell_keys = np.zeros(0, dtype=np.int64)
+        self.order = np.zeros(0, dtype=np.intp)
+        self.sorted_keys = np.zeros(0, dtype=np.int64)
+
+    def _cell_keys(self, cells):
+        return (cells[:, 0] + self._OFFSET) * self._STRIDE + cells[:, 1] + self._OFFSET
+
+    def _find_cells(self, cells):
+        """Index of each cell among the occupied cells, -1 where it is empty."""
+        keys = self._cell_keys(cells)
+        index = np.searchsorted(self.cell_keys, keys)
+        found = index < len(self.cell_keys)
+        found[found] = self.cell_keys[index[found]] == keys[found]
+        return np.where(found, index, -1)
+
+    def rebuild(self, positions, groups=None):
+        """
+        Index a (points, 2) array of positions.
+
+        Points sharing a group label are never paired; without groups every
+        point is a group of its own.
+        """
+        self.positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        count = len(self.positions)
+        if groups is None:
+            groups = np.arange(count)
+        labels, self.groups = np.unique(np.asarray(groups), return_inverse=True)
+        self.groups = self.groups.reshape(-1)
+        self.group_count = max(len(labels), 1)
+
+        self.cells = np.floor(self.positions / self.cell_size).astype(np.int64)
+        self.cell_keys, cell_index = np.unique(
+            self._cell_keys(self.cells), return_inverse=True
+        )
+        keys = cell_index.reshape(-1) * self.group_count + self.groups
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    def pairs(self, radius):
+        """
+        Ordered pairs (i, j) of indexed points in different groups closer than radius.
+
+        Returns:
+            tuple: two index arrays, each pair appearing in both orders.
+        """
+        reach = math.ceil(radius / self.cell_size)
+        lows, highs, points = [], [], []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                cells = self._find_cells(self.cells + (dx, dy))
+                occupied = np.flatnonzero(cells >= 0)
+                base = cells[occupied] * self.group_count
+                own = base + self.groups[occupied]
+                # The cell's run of the sorted order, split around the point's group
+                lows += [
+                    np.searchsorted(self.sorted_keys, base, side="left"),
+                    np.searchsorted(self.sorted_keys, own, side="right"),
+                ]
+                highs += [
+                    np.searchsorted(self.sorted_keys, own, side="left"),
+                    np.searchsorted(
+                        self.sorted_keys, base + self.group_count, side="left"
+                    ),
+                ]
+                points += [occupied, occupied]
+
+        if not points:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty
+        low, high = np.concatenate(lows), np.concatenate(highs)
+        sizes = high - low
+        total = sizes.sum()
+        # Expand each [low, high) run of the sorted order into pairs
+        starts = np.repeat(low - np.cumsum(sizes) + sizes, sizes)
+        first = np.repeat(np.concatenate(points), sizes)
+        second = self.order[starts + np.arange(total)]
+        offsets = self.positions[second] - self.positions[first]
+        close = (offsets**2).sum(axis=1) < radius * radius
+        return first[close], second[close]
+
+    def clusters(self):
+        """
+        Split every group into clusters of points linked through the same or
+        adjacent cells, so any two members closer than cell_size stay together.
+
+        Returns:
+            (points,) labels, equal exactly within a cluster.
+        """
+        nodes, first_point, node_of = np.unique(
+            self.sorted_keys, return_index=True, return_inverse=True
+        )
+        if not len(nodes):
+            return np.zeros(0, dtype=np.intp)
+        node_cells = self.cells[self.order[first_point]]
+        node_groups = nodes % self.group_count
+
+        links = []
+        for offset in [(1, -1), (1, 0), (1, 1), (0, 1)]:
+            cells = self._find_cells(node_cells + offset)
+            keys = cells * self.group_count + node_groups
+            index = np.minimum(np.searchsorted(nodes, keys), len(nodes) - 1)
+            linked = (cells >= 0) & (nodes[index] == keys)
+            links.append((np.flatnonzero(linked), index[linked]))
+        first = np.concatenate([link[0] for link in links])
+        second = np.concatenate([link[1] for link in links])
+
+        # Spread the lowest node index through each cluster, jumping along
+        # labels so long chains of cells settle in a few rounds
+        labels = np.arange(len(nodes))
+        while True:
+            spread = labels.copy()
+            np.minimum.at(spread, first, labels[second])
+            np.minimum.at(spread, second, labels[first])
+            spread = spread[spread]
+            if (spread == labels).all():
+                break
+            labels = spread
+
+        point_labels = np.empty(len(self.positions), dtype=np.intp)
+        point_labels[self.order] = labels[node_of.reshape(-1)]
+        return point_labels
+
+
+class Traffic:
+    """
+    Interaction between cars driving the same track at once.
+
+    Each car is a disc of car_radius. Cars whose discs touch crash, and sensor
+    rays stop at the first other car as well as at walls.
+
+    Every car starts on the same spot, so cars carry group labels: cars that
+    have stayed together since the start, linked through neighbouring cells
+    of the contact hash, share a group, and pass through and cannot see each
+    other. A car that pulls clear gets a group of its own, and any contact
+    with another group is a crash. Cars driving identically stay together as
+    one group, while a car lingering at the start is fair game once the
+    others have left.
+
+    Two spatial hashes, rebuilt every step over the cars' positions and
+    groups, keep both tests to cars of other groups in neighbouring cells, so
+    the cost grows roughly linearly with the population even while it is
+    still bunched up at the start.
+    """
+
+    def __init__(self, car_radius=10, sensor_range=200):
+        self.car_radius = car_radius
+        self.contacts = SpatialHash(2 * car_radius)
+        self.sensing = SpatialHash(sensor_range + car_radius)
+
+    def collisions(self, positions, groups):
+        """
+        Find the cars touching a car outside their group, and regroup the rest.
+
+        Args:
+            positions: (cars, 2) positions of every car on the track.
+            groups: (cars,) group labels, equal for every car at the start.
+
+        Returns:
+            tuple: bool array marking crashed cars, and the cars' new groups.
+        """
+        self.contacts.rebuild(positions, groups)
+        first, _ = self.contacts.pairs(2 * self.car_radius)
+        crashed = np.zeros(len(self.contacts.positions), dtype=bool)
+        crashed[first] = True
+        return crashed, self.contacts.clusters()
+
+    def ray_distances(self, positions, ray_angles, max_distance, groups):
+        """
+        Distance along each ray to the nearest car of another group.
+
+        Args:
+            positions: (cars, 2) positions of every car on the track.
+            ray_angles: (cars, rays) ray directions in radians.
+            groups: (cars,) group labels from collisions.
+
+        Returns:
+            (cars, rays) array, max_distance where no car is within range.
+        """
+        distances = np.full(ray_angles.shape, float(max_distance))
+        self.sensing.rebuild(positions, groups)
+        first, second = self.sensing.pairs(max_distance + self.car_radius)
+        if not len(first):
+            return distances
+
+        # Ray against disc: distance along the ray to the closest approach,
+        # minus the half chord where the ray passes within car_radius
+        offsets = self.sensing.positions[second] - self.sensing.positions[first]
+        angles = ray_angles[first]
+        dir_x, dir_y = np.cos(angles), np.sin(angles)
+        along = offsets[:, 0, None] * dir_x + offsets[:, 1, None] * dir_y
+        across = (offsets**2).sum(axis=1)[:, None] - along**2
+        chord = np.sqrt(np.maximum(self.car_radius**2 - across, 0))
+        hits = np.where(
+            (across <= self.car_radius**2) & (along + chord >= 0),
+            np.maximum(along - chord, 0),
+            np.inf,
+        )
+
+        np.minimum.at(distances, first, hits)
+        return distances
@@ -0,0 +1,304 @@
+import numpy as np
+
+# Marching-squares segments per case, as pairs of edge midpoints. The case index
+# is tl * 8 + tr * 4 + br * 2 + bl for the four pixel centres of a square.
+# Saddles (5, 10) keep the two on-track corners apart, so walls stay closed.
+_EDGES = {"T": (0, -1), "R": (1, 0), "B": (0, 1), "L": (-1, 0)}
+_CASES = {
+    1: ["LB"],
+    2: ["BR"],
+    3: ["LR"],
+    4: ["TR"],
+    5: ["TR", "LB"],
+    6: ["TB"],
+    7: ["TL"],
+    8: ["TL"],
+    9: ["TB"],
+    10: ["TL", "BR"],
+    11: ["TR"],
+    12: ["LR"],
+    13: ["BR"],
+    14: ["LB"],
+}
+
+
+def extract_segments(mask):
+    """
+    Trace the walls of a (height, width) drivable mask as line segments.
+
+    Runs marching squares over pixel centres (outside the mask counts as a
+    wall), then merges collinear pieces, so straight edges and 45 degree
+    corner smoothing become a handful of long segments.
+
+    Returns:
+        (segments, 4) float array of x0, y0, x1, y1 in pixel coordinates.
+    """
+    padded = np.pad(mask.astype(np.uint8), 1)
+    cases = (
+        padded[:-1, :-1] * 8
+        + padded[:-1, 1:] * 4
+        + padded[1:, 1:] * 2
+        + padded[1:, :-1]
+    )
+
+    # Work in doubled coordinates so every endpoint is an integer: square (y, x)
+    # is centred on pixel corner (x, y), i.e. (2x, 2y), with edge midpoints one away.
+    boundary = np.flatnonzero((cases != 0) & (cases != 15))
+    boundary_cases = cases.ravel()[boundary]
+    pieces = []
+    for case, segments in _CASES.items():
+        ys, xs = np.divmod(boundary[boundary_cases == case], cases.shape[1])
+        if len(xs) == 0:
+            continue
+        for start, end in segments:
+            (sx, sy), (ex, ey) = _EDGES[start], _EDGES[end]
+            pieces.append(
+                np.stack([2 * xs + sx, 2 * ys + sy, 2 * xs + ex, 2 * ys + ey], axis=1)
+            )
+    if not pieces:
+        return np.zeros((0, 4))
+
+    return _merge_collinear(np.concatenate(pieces)) / 2
+
+
+def _merge_collinear(segments):
+    """Join touching segments that lie on the same axis-aligned or diagonal line."""
+    # Order endpoints so each segment points right (or down when vertical)
+    swap = (segments[:, 0] > segments[:, 2]) | (
+        (segments[:, 0] == segments[:, 2]) & (segments[:, 1] > segments[:, 3])
+    )
+    segments[swap] = segments[swap][:, [2, 3, 0, 1]]
+
+    dx = np.sign(segments[:, 2] - segments[:, 0])
+    dy = np.sign(segments[:, 3] - segments[:, 1])
+    direction = (dx + 1) * 3 + (dy + 1)
+    line = np.where(
+        dx == 0,
+        segments[:, 0],
+        segments[:, 1] - dy * segments[:, 0],
+    )
+    along = np.where(dx == 0, segments[:, 1], segments[:, 0])
+    along_end = np.where(dx == 0, segments[:, 3], segments[:, 2])
+
+    order = np.lexsort((along, line, direction))
+    merged = []
+    current = None
+    for index in order:
+        key = (direction[index], line[index])
+        if current is not None and current[0] == key and along[index] <= current[2]:
+            if along_end[index] > current[2]:
+                current[2] = along_end[index]
+                current[3] = segments[index, 2:]
+            continue
+        if current is not None:
+            merged.append(np.concatenate([current[1], current[3]]))
+        current = [key, segments[index, :2], along_end[index], segments[index, 2:]]
+    merged.append(np.concatenate([current[1], current[3]]))
+    return np.array(merged, dtype=np.float64)
+
+
+def wall_clearance(mask, limit=32):
+    """
+    Chessboard distance in pixels from each on-track pixel to the nearest
+    off-track one (outside the mask counts as off track), capped at limit.
+
+    Returns:
+        (height, width) uint8 array, 0 off track.
+    """
+    clearance = np.zeros(mask.shape, dtype=np.uint8)
+    inside = np.pad(mask.astype(bool), 1)
+    for distance in range(1, limit + 1):
+        clearance[inside[1:-1, 1:-1]] = distance
+        # Erode by one pixel in every direction, including diagonals
+        eroded = inside.copy()
+        eroded[1:-1] &= inside[:-2] & inside[2:]
+        inside = eroded.copy()
+        inside[:, 1:-1] &= eroded[:, :-2] & eroded[:, 2:]
+        inside[[0, -1]] = False
+        inside[:, [0, -1]] = False
+        if not inside.any():
+            break
+    return clearance
+
+
+class WallIndex:
+    """
+    Wall segments in a uniform grid, for exact ray and motion intersection.
+
+    Each segment is registered in every cell within margin of it, for moves,
+    and on first use in every cell within a ray's length of it, so a car's
+    rays only test the segments listed for its own cell. With a clearance map
+    (see wall_clearance), moves that start further from any wall than they
+    are long skip the segment test.
+    """
+
+    def __init__(
+        self, segments, width, height, cell_size=64, margin=16, clearance=None
+    ):
+        self.segments = segments
+        self.cell_size = cell_size
+        self.margin = margin
+        self.clearance = clearance
+        self.cols = int(np.ceil((width + 2) / cell_size)) + 1
+        self.rows = int(np.ceil((height + 2) / cell_size)) + 1
+
+        self.offsets, self.counts, self.table = self._register(margin)
+        self._reach = {}
+
+    def _register(self, margin):
+        """
+        Register every segment in each cell within margin of it.
+
+        Returns:
+            tuple: (offsets, counts, table), the cells' segments as start and
+            edge vector stored cell after cell, so cell i holds
+            table[offsets[i] : offsets[i] + counts[i]].
+        """
+        buckets = [[] for _ in range(self.rows * self.cols)]
+        for index, (x0, y0, x1, y1) in enumerate(self.segments):
+            col0, row0 = self._cell(min(x0, x1) - margin, min(y0, y1) - margin)
+            col1, row1 = self._cell(max(x0, x1) + margin, max(y0, y1) + margin)
+            for row in range(row0, row1 + 1):
+                for col in range(col0, col1 + 1):
+                    buckets[row * self.cols + col].append(index)
+
+        counts = np.array([len(bucket) for bucket in buckets], dtype=np.intp)
+        index = np.array(
+            [segment for bucket in buckets for segment in bucket], dtype=np.intp
+        )
+        table = np.zeros((len(index), 4))
+        if len(index):
+            table[:, :2] = self.segments[index, :2]
+            table[:, 2:] = self.segments[index, 2:] - self.segments[index, :2]
+        return np.cumsum(counts) - counts, counts, table
+
+    @classmethod
+    def from_mask(cls, mask, **kwargs):
+        height, width = mask.shape
+        kwargs.setdefault("clearance", wall_clearance(mask))
+        return cls(extract_segments(mask), width, height, **kwargs)
+
+    def _cell(self, x, y):
+        """Grid cell (col, row) of a point, clamped to the grid."""
+        col = min(max(int((x + 1) // self.cell_size), 0), self.cols - 1)
+        row = min(max(int((y + 1) // self.cell_size), 0), self.rows - 1)
+        return col, row
+
+    def _within_reach(self, max_distance):
+        """Per cell, every segment a ray of max_distance starting there could hit."""
+        if max_distance not in self._reach:
+            self._reach[max_distance] = self._register(max_distance)
+        return self._reach[max_distance]
+
+    @staticmethod
+    def _hit_distances(offset_x, offset_y, edge_x, edge_y, dir_x, dir_y, max_distance):
+        """
+        Solve origin + t * direction = start + u * edge with 2D cross products,
+        where offset = start - origin. Broadcasts, and gives t for each hit and
+        max_distance elsewhere.
+        """
+        denominator = dir_x * edge_y - dir_y * edge_x
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = (offset_x * edge_y - offset_y * edge_x) / denominator
+            u = (offset_x * dir_y - offset_y * dir_x) / denominator
+        # Parallel segments give nan or inf and fail every comparison
+        hit = (t >= 0) & (t < max_distance) & (u >= 0) & (u <= 1)
+        return np.where(hit, t, max_distance)
+
+    def ray_distances(self, origins, angles, max_distance):
+        """
+        Exact distance to the nearest wall along each ray.
+
+        Args:
+            origins: (cars, 2) ray start points.
+            angles: (cars, rays) ray directions in radians.
+
+        Returns:
+            (cars, rays) array, max_distance where no wall is within range.
+        """
+        offsets, counts, table = self._within_reach(max_distance)
+
+        if len(origins) == 1:
+            # One car's candidates are a slice, tested against every ray at once
+            col, row = self._cell(*origins[0])
+            cell = row * self.cols + col
+            candidates = table[offsets[cell] : offsets[cell] + counts[cell]]
+            distances = self._hit_distances(
+                candidates[:, 0] - origins[0, 0],
+                candidates[:, 1] - origins[0, 1],
+                candidates[:, 2],
+                candidates[:, 3],
+                np.cos(angles[0])[:, None],
+                np.sin(angles[0])[:, None],
+                max_distance,
+            )
+            return distances.min(axis=1, initial=max_distance)[None]
+
+        cols = (origins[:, 0] + 1) // self.cell_size
+        rows = (origins[:, 1] + 1) // self.cell_size
+        np.clip(cols, 0, self.cols - 1, out=cols)
+        np.clip(rows, 0, self.rows - 1, out=rows)
+        cells = (rows * self.cols + cols).astype(np.intp)
+
+        # Expand each car into the segments within reach of its cell, and test
+        # all of the car's rays against each
+        sizes = counts[cells]
+        cars = np.arange(len(cells)).repeat(sizes)
+        ends = sizes.cumsum()
+        candidates = table[
+            np.arange(len(cars)) + (offsets[cells] - ends + sizes).repeat(sizes)
+        ]
+        hits = self._hit_distances(
+            (candidates[:, 0] - origins[cars, 0])[:, None],
+            (candidates[:, 1] - origins[cars, 1])[:, None],
+            candidates[:, 2, None],
+            candidates[:, 3, None],
+            np.cos(angles)[cars],
+            np.sin(angles)[cars],
+            max_distance,
+        )
+
+        # Candidates are grouped by car, so reduce each car's run at once
+        distances = np.full(angles.shape, float(max_distance))
+        reached = sizes > 0
+        distances[reached] = np.minimum.reduceat(hits, (ends - sizes)[reached])
+        return distances
+
+    def crosses(self, start, end):
+        """Whether the straight move from start to end passes through a wall."""
+        (sx, sy), (ex, ey) = start, end
+        move_x, move_y = ex - sx, ey - sy
+
+        # Every pixel within clearance - 1 of the start is on track, and the
+        # segments bordering them lie at most two pixels further out
+        if self.clearance is not None and sx >= 0 and sy >= 0:
+            x, y = int(sx), int(sy)
+            if y < self.clearance.shape[0] and x < self.clearance.shape[1]:
+                if max(abs(move_x), abs(move_y)) + 3 <= self.clearance[y, x]:
+                    return False
+
+        col0, row0 = self._cell(min(sx, ex), min(sy, ey))
+        col1, row1 = self._cell(max(sx, ex), max(sy, ey))
+        candidates = np.concatenate(
+            [
+                self.table[self.offsets[cell] : self.offsets[cell] + self.counts[cell]]
+                for cell in (
+                    row * self.cols + col
+                    for row in range(row0, row1 + 1)
+                    for col in range(col0, col1 + 1)
+                )
+            ]
+        )
+
+        # Same cross products as ray_distances, with t and u both limited to [0, 1]
+        to_x = candidates[:, 0] - sx
+        to_y = candidates[:, 1] - sy
+        edge_x, edge_y = candidates[:, 2], candidates[:, 3]
+        denominator = move_x * edge_y - move_y * edge_x
+        sign = np.sign(denominator)
+        denominator *= sign
+        t_cross = (to_x * edge_y - to_y * edge_x) * sign
+        u_cross = (to_x * move_y - to_y * move_x) * sign
+        hit = (denominator > 0) & (t_cross >= 0) & (t_cross <= denominator)
+        hit &= (u_cross >= 0) & (u_cross <= denominator)
+        return bool(hit.any())